@@ -1,9 +1,8 @@
 """
 Configuration settings for the Drug Traceability System Backend
 """
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import List
-from functools import lru_cache
 
 
 class Settings(BaseSettings):
@@ -11,6 +10,8 @@ class Settings(BaseSettings):
     Application settings loaded from environment variables
     """
     
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=True, frozen=True)
+    
     # Server Configuration
     HOST: str = "0.0.0.0"
     PORT: int = 8000
@@ -18,11 +19,17 @@ class Settings(BaseSettings):
     # MongoDB Configuration
     MONGODB_URL: str = "mongodb://localhost:27017"
     MONGODB_DB_NAME: str = "drug_traceability"
+    MONGODB_MIN_POOL: int = 10
+    MONGODB_MAX_POOL: int = 100
     
     # Blockchain Configuration
     BLOCKCHAIN_PROVIDER_URL: str = "http://127.0.0.1:7545"
     CONTRACT_ADDRESS: str = ""
     PRIVATE_KEY: str = ""
+    BLOCKCHAIN_MAX_CONNECTIONS: int = 50
+    BLOCKCHAIN_TIMEOUT: int = 10
+    RPC_MAX_RPS: float = 100
+    CONTRACT_DEPLOY_BLOCK: int = 0
     
     # CORS Configuration
     CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://127.0.0.1:3000"]
@@ -31,19 +38,14 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
-    
-    class Config:
-        env_file = ".env"
-        case_sensitive = True
 
 
-@lru_cache()
+# Global settings instance, loaded once at import
+settings = Settings()
+
+
 def get_settings() -> Settings:
     """
-    Get cached settings instance
+    Get the global settings instance
     """
-    return Settings()
-
-
-# Global settings instance
-settings = get_settings()
+    return settings
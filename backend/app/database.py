@@ -1,23 +1,96 @@
 """
 MongoDB Database Connection and Configuration
 """
-from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import ASCENDING, IndexModel
+from pymongo import AsyncMongoClient, ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
 from app.config import settings
+from typing import Set
+import asyncio
 import logging
+import weakref
 
 logger = logging.getLogger(__name__)
 
 
-class Database:
+class MongoClientPool:
     """
-    Database connection manager
+    Database connection manager holding one client per event loop
+    
+    An async client is bound to the loop it was created on, so sharing one
+    across loops (tests, reloads, scripts) breaks; each loop gets its own.
+    Clients are held weakly by loop and closed when their loop shuts down.
     """
-    client: AsyncIOMotorClient = None
-    db = None
+    
+    def __init__(self):
+        self._by_loop: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncMongoClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+        # Tasks that close a client once its loop cancels them at shutdown
+        self._closers: Set[asyncio.Task] = set()
+    
+    def get(self) -> AsyncMongoClient:
+        """
+        Get the client for the running event loop, creating it on first use
+        """
+        loop = asyncio.get_running_loop()
+        client = self._by_loop.get(loop)
+        
+        if client is None:
+            self._discard_closed_loops()
+            
+            client = AsyncMongoClient(
+                settings.MONGODB_URL,
+                minPoolSize=settings.MONGODB_MIN_POOL,
+                maxPoolSize=settings.MONGODB_MAX_POOL,
+                waitQueueTimeoutMS=5000,
+                serverSelectionTimeoutMS=2000
+            )
+            self._by_loop[loop] = client
+            
+            closer = loop.create_task(self._close_on_shutdown(client))
+            self._closers.add(closer)
+            closer.add_done_callback(self._closers.discard)
+        
+        return client
+    
+    async def close(self):
+        """
+        Close the client of the running event loop, if any
+        """
+        loop = asyncio.get_running_loop()
+        self._by_loop.pop(loop, None)
+        
+        for closer in [task for task in self._closers if task.get_loop() is loop]:
+            closer.cancel()
+            await asyncio.gather(closer, return_exceptions=True)
+    
+    @staticmethod
+    async def _close_on_shutdown(client: AsyncMongoClient):
+        """
+        Wait until cancelled (by close() or loop shutdown), then close the client
+        """
+        try:
+            await asyncio.get_running_loop().create_future()
+        except asyncio.CancelledError:
+            await client.close()
+            raise
+    
+    def _discard_closed_loops(self):
+        """
+        Drop clients whose loop was closed without cancelling its tasks
+        
+        Such a client can no longer be closed; dropping it frees its loop.
+        """
+        for loop in [loop for loop in self._by_loop if loop.is_closed()]:
+            logger.warning("Discarding MongoDB client of a closed event loop")
+            del self._by_loop[loop]
+        
+        self._closers.difference_update(
+            [task for task in self._closers if task.get_loop().is_closed()]
+        )
 
 
-database = Database()
+mongo_pool = MongoClientPool()
 
 
 async def connect_to_mongo():
@@ -26,11 +99,9 @@ async def connect_to_mongo():
     """
     try:
         logger.info(f"Connecting to MongoDB at {settings.MONGODB_URL}")
-        database.client = AsyncIOMotorClient(settings.MONGODB_URL)
-        database.db = database.client[settings.MONGODB_DB_NAME]
         
         # Test connection
-        await database.client.admin.command('ping')
+        await mongo_pool.get().admin.command('ping')
         logger.info("Successfully connected to MongoDB")
         
         # Create indexes
@@ -46,36 +117,80 @@ async def close_mongo_connection():
     Close MongoDB connection
     """
     try:
-        if database.client:
-            database.client.close()
-            logger.info("MongoDB connection closed")
+        await mongo_pool.close()
+        logger.info("MongoDB connection closed")
     except Exception as e:
         logger.error(f"Error closing MongoDB connection: {str(e)}")
 
 
+async def ping_database() -> bool:
+    """
+    Check that MongoDB is reachable
+    """
+    try:
+        await mongo_pool.get().admin.command('ping')
+        return True
+    except Exception as e:
+        logger.error(f"MongoDB ping error: {str(e)}")
+        return False
+
+
 async def create_indexes():
     """
     Create database indexes for better query performance
     """
     try:
+        db = await get_database()
+        
         # Users collection indexes
         users_indexes = [
             IndexModel([("walletAddress", ASCENDING)], unique=True),
             IndexModel([("role", ASCENDING)])
         ]
-        await database.db.users.create_indexes(users_indexes)
+        await db.users.create_indexes(users_indexes)
         
         # Drug composition dataset indexes
         dataset_indexes = [
             IndexModel([("drugName", ASCENDING)], unique=True)
         ]
-        await database.db.drug_composition_dataset.create_indexes(dataset_indexes)
+        await db.drug_composition_dataset.create_indexes(dataset_indexes)
+        
+        # Drugs registered before transferCount was stored count as incomplete;
+        # give them an explicit 0 so the partial index below covers them
+        await db.drug_composition_storage.update_many(
+            {"transferCount": None},
+            {"$set": {"transferCount": 0}}
+        )
         
         # Drug composition storage indexes
         storage_indexes = [
-            IndexModel([("batchId", ASCENDING)], unique=True)
+            IndexModel([("batchId", ASCENDING)], unique=True),
+            # Matches OwnershipTransferred logs, which carry the hashed batch ID
+            IndexModel([("batchIdTopic", ASCENDING)]),
+            # Audit queries: expired drugs, per-manufacturer activity, anomalies
+            # (expiryDate-only queries use the expiryDate/manufacturer prefix)
+            IndexModel([("manufacturer", ASCENDING), ("registrationTimestamp", ASCENDING)]),
+            IndexModel([("expiryDate", ASCENDING), ("manufacturer", ASCENDING)]),
+            # Only drugs with an incomplete ownership chain, which stay few
+            IndexModel(
+                [("transferCount", ASCENDING), ("expiryDate", ASCENDING)],
+                partialFilterExpression={"transferCount": {"$lt": 2}}
+            )
+        ]
+        await db.drug_composition_storage.create_indexes(storage_indexes)
+        
+        # Single-field expiryDate index from earlier versions, now redundant
+        try:
+            await db.drug_composition_storage.drop_index("expiryDate_1")
+        except OperationFailure:
+            pass
+        
+        # Drug batch master record indexes (transfer lookups, owner inventory)
+        batches_indexes = [
+            IndexModel([("batchId", ASCENDING)], unique=True),
+            IndexModel([("currentOwner", ASCENDING), ("status", ASCENDING)])
         ]
-        await database.db.drug_composition_storage.create_indexes(storage_indexes)
+        await db.drug_batches.create_indexes(batches_indexes)
         
         logger.info("Database indexes created successfully")
         
@@ -83,8 +198,8 @@ async def create_indexes():
         logger.error(f"Error creating indexes: {str(e)}")
 
 
-def get_database():
+async def get_database():
     """
-    Get database instance
+    Get database instance for the running event loop
     """
-    return database.db
+    return mongo_pool.get()[settings.MONGODB_DB_NAME]
@@ -2,14 +2,20 @@
 Drug Traceability System - FastAPI Backend
 Main Application Entry Point
 """
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi import FastAPI, Response, status
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
+import asyncio
 import logging
+import time
 
 from app.config import settings
-from app.database import connect_to_mongo, close_mongo_connection
+from app.database import connect_to_mongo, close_mongo_connection, ping_database
+from app.middleware import ExactOriginCORSMiddleware
 from app.routes import auth_router, drugs_router, verification_router, audit_router
+from app.utils import get_blockchain_service, watch_ownership_events
+from app.utils.hashing import check_sha256_backend
+from app.utils.pagination import NEXT_CURSOR_HEADER
 
 # Configure logging
 logging.basicConfig(
@@ -18,6 +24,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Seconds a health probe result is reused, so frequent scrapes stay cheap
+HEALTH_CACHE_TTL = 2.0
+_health_cache = {"timestamp": 0.0, "payload": None}
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -27,14 +37,33 @@ async def lifespan(app: FastAPI):
     """
     # Startup
     logger.info("Starting Drug Traceability System Backend...")
+    check_sha256_backend()
     await connect_to_mongo()
+    
+    blockchain = get_blockchain_service()
+    
+    # The node may come up after the API; blockchain calls fail until it does
+    try:
+        await blockchain.connect()
+    except ConnectionError as e:
+        logger.warning(f"Blockchain node not reachable at startup: {str(e)}")
+    
+    # Follow ownership transfers on chain to keep stored ownership state current
+    ownership_watcher = None
+    if blockchain.contract_address:
+        ownership_watcher = asyncio.create_task(watch_ownership_events(blockchain))
+    
     logger.info("Backend started successfully")
     
     yield
     
     # Shutdown
     logger.info("Shutting down Drug Traceability System Backend...")
+    if ownership_watcher is not None:
+        ownership_watcher.cancel()
+        await asyncio.gather(ownership_watcher, return_exceptions=True)
     await close_mongo_connection()
+    await get_blockchain_service().close()
     logger.info("Backend shutdown complete")
 
 
@@ -68,16 +97,18 @@ app = FastAPI(
     * Role-based access control
     """,
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
-# Configure CORS
+# Configure CORS (exact origin matches skip the generic CORS handling)
 app.add_middleware(
-    CORSMiddleware,
+    ExactOriginCORSMiddleware,
     allow_origins=settings.CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Include routers
@@ -100,16 +131,34 @@ async def root():
     }
 
 
-@app.get("/health")
-async def health_check():
+@app.api_route("/health", methods=["GET", "HEAD"])
+async def health_check(response: Response):
     """
     Health check endpoint for monitoring
+    
+    Probes MongoDB and the blockchain node; results are cached briefly.
+    Returns 503 if either dependency is unreachable.
     """
-    return {
-        "status": "healthy",
-        "database": "connected",
-        "blockchain": "connected"
-    }
+    now = time.monotonic()
+    payload = _health_cache["payload"]
+    
+    if payload is None or now - _health_cache["timestamp"] >= HEALTH_CACHE_TTL:
+        database_ok, blockchain_ok = await asyncio.gather(
+            ping_database(),
+            get_blockchain_service().ping()
+        )
+        payload = {
+            "status": "healthy" if database_ok and blockchain_ok else "unhealthy",
+            "database": "connected" if database_ok else "disconnected",
+            "blockchain": "connected" if blockchain_ok else "disconnected"
+        }
+        _health_cache["timestamp"] = now
+        _health_cache["payload"] = payload
+    
+    if payload["status"] != "healthy":
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    
+    return payload
 
 
 if __name__ == "__main__":
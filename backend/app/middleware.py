@@ -0,0 +1,71 @@
+"""
+ASGI Middleware
+"""
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.cors import CORSMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Sequence
+
+
+class ExactOriginCORSMiddleware:
+    """
+    CORS middleware with a fast path for exact-match origins
+
+    Simple (non-preflight) requests from an allowed origin get their CORS
+    headers added directly after a set lookup. Preflight requests and
+    unknown origins are delegated to Starlette's CORSMiddleware.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        allow_origins: Sequence[str] = (),
+        allow_credentials: bool = False,
+        expose_headers: Sequence[str] = (),
+        **cors_options
+    ) -> None:
+        self.app = app
+        self.allowed_origins = frozenset(allow_origins)
+        self.fallback = CORSMiddleware(
+            app,
+            allow_origins=allow_origins,
+            allow_credentials=allow_credentials,
+            expose_headers=expose_headers,
+            **cors_options
+        )
+
+        self.simple_headers = {}
+        if allow_credentials:
+            self.simple_headers["Access-Control-Allow-Credentials"] = "true"
+        if expose_headers:
+            self.simple_headers["Access-Control-Expose-Headers"] = ", ".join(expose_headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        origin = headers.get("origin")
+
+        if origin is None:
+            await self.app(scope, receive, send)
+            return
+
+        is_preflight = (
+            scope["method"] == "OPTIONS" and "access-control-request-method" in headers
+        )
+        if is_preflight or origin not in self.allowed_origins:
+            await self.fallback(scope, receive, send)
+            return
+
+        async def send_with_cors(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                response_headers = MutableHeaders(scope=message)
+                response_headers.update(self.simple_headers)
+                response_headers["Access-Control-Allow-Origin"] = origin
+                response_headers.add_vary_header("Origin")
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
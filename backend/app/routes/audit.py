@@ -2,16 +2,110 @@
 Audit and Monitoring Routes (Regulator Only)
 Handles system-wide auditing and anomaly detection
 """
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, Response, status
 from app.schemas import AuditResult, AuditStatistics
 from app.database import get_database
-from app.utils import blockchain_service
-from typing import List
+from app.utils import (
+    BlockchainService,
+    get_blockchain,
+    cursor_filter,
+    next_cursor,
+    MAX_PAGE_SIZE,
+    NEXT_CURSOR_HEADER,
+    chain_state_update,
+    sync_chain_state
+)
+from typing import List, Optional
+import asyncio
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/audit", tags=["Audit"])
 
+# Number of streamed drugs verified together when scanning for anomalies
+ANOMALY_VERIFY_BATCH = 50
+
+
+async def _total_transfers(storage) -> int:
+    """Sum the denormalized transfer counts of all drugs"""
+    cursor = await storage.aggregate([
+        {"$group": {"_id": None, "n": {"$sum": "$transferCount"}}}
+    ])
+    result = await cursor.to_list(length=1)
+    return result[0]["n"] if result else 0
+
+
+async def _find_anomalies(
+    db,
+    blockchain: BlockchainService,
+    drugs: List[dict],
+    current_timestamp: int
+) -> List[dict]:
+    """
+    Check a batch of drugs for anomalies
+    
+    Args:
+        db: Database instance, for syncing ownership state from the chain
+        blockchain: Blockchain service to query
+        drugs: Drug documents to check
+        current_timestamp: Reference time for expiry checks
+        
+    Returns:
+        Audit results for the drugs that have anomalies
+    """
+    anomalous_drugs = []
+    
+    # Verify the drugs on blockchain (recent results come from the service cache)
+    verifications = await blockchain.verify_drugs_batch([drug.get("batchId") for drug in drugs])
+    
+    await sync_chain_state(db, [
+        chain_state_update(drug.get("batchId"), drug, verification)
+        for drug, verification in zip(drugs, verifications)
+    ])
+    
+    for drug, verification in zip(drugs, verifications):
+        batch_id = drug.get("batchId")
+        has_anomaly = False
+        anomaly_type = "None"
+        
+        # Check expiry
+        if drug.get("expiryDate", 0) < current_timestamp:
+            has_anomaly = True
+            anomaly_type = "Expired"
+        
+        if verification.get("success"):
+            transfer_count = verification.get("transferCount", 0)
+            
+            # Check for incomplete chain
+            if transfer_count < 2 and not has_anomaly:
+                has_anomaly = True
+                anomaly_type = "Incomplete ownership chain"
+            
+            if has_anomaly:
+                anomalous_drugs.append({
+                    "batchId": batch_id,
+                    "hasAnomalies": True,
+                    "anomalyType": anomaly_type,
+                    "ownershipCount": transfer_count,
+                    "drugName": drug.get("drugName", "Unknown"),
+                    "manufacturer": drug.get("manufacturer", "Unknown"),
+                    "currentOwner": verification.get("currentOwner", "Unknown")
+                })
+        else:
+            # Blockchain verification failed
+            anomalous_drugs.append({
+                "batchId": batch_id,
+                "hasAnomalies": True,
+                "anomalyType": "Blockchain verification failed",
+                "ownershipCount": 0,
+                "drugName": drug.get("drugName", "Unknown"),
+                "manufacturer": drug.get("manufacturer", "Unknown"),
+                "currentOwner": "Unknown"
+            })
+    
+    return anomalous_drugs
+
 
 @router.get("/statistics", response_model=AuditStatistics)
 async def get_audit_statistics(db=Depends(get_database)):
@@ -26,50 +120,36 @@ async def get_audit_statistics(db=Depends(get_database)):
     - Expired drugs
     """
     try:
-        # Get total counts from MongoDB
-        total_drugs_db = await db.drug_composition_storage.count_documents({})
-        total_users = await db.users.count_documents({})
-        
-        # Get all drug batches and check for anomalies
-        drugs_cursor = db.drug_composition_storage.find({})
-        drugs = await drugs_cursor.to_list(length=1000)
+        current_timestamp = int(time.time())
         
-        drugs_with_anomalies = 0
-        expired_drugs = 0
+        expired = {"expiryDate": {"$lt": current_timestamp}}
+        # Matches the partial index; create_indexes backfills missing counts
+        incomplete_chain = {"transferCount": {"$lt": 2}}
         
-        import time
-        current_timestamp = int(time.time())
+        storage = db.drug_composition_storage
         
-        for drug in drugs:
-            batch_id = drug.get("batchId")
-            
-            # Check expiry
-            if drug.get("expiryDate", 0) < current_timestamp:
-                expired_drugs += 1
-            
-            # Verify on blockchain to check for anomalies
-            try:
-                verification = await blockchain_service.verify_drug(batch_id)
-                
-                if verification.get("success"):
-                    # Check for incomplete chain
-                    if verification.get("transferCount", 0) < 2:
-                        drugs_with_anomalies += 1
-                else:
-                    drugs_with_anomalies += 1
-            except:
-                drugs_with_anomalies += 1
+        # Count server-side; $facet sub-pipelines cannot use indexes, so each
+        # statistic is issued as its own index-backed query, all in parallel
+        total_drugs, total_users, expired_drugs, drugs_with_anomalies, transfers = (
+            await asyncio.gather(
+                storage.count_documents({}),
+                db.users.count_documents({}),
+                storage.count_documents(expired),
+                storage.count_documents({"$or": [incomplete_chain, expired]}),
+                _total_transfers(storage)
+            )
+        )
         
         return {
-            "totalDrugs": total_drugs_db,
+            "totalDrugs": total_drugs,
             "totalUsers": total_users,
-            "totalTransfers": 0,  # Would need to sum from blockchain
+            "totalTransfers": transfers,
             "drugsWithAnomalies": drugs_with_anomalies,
             "expiredDrugs": expired_drugs
         }
         
     except Exception as e:
-        logger.error(f"Get audit statistics error: {str(e)}")
+        logger.error("Get audit statistics error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to retrieve audit statistics: {str(e)}"
@@ -77,7 +157,13 @@ async def get_audit_statistics(db=Depends(get_database)):
 
 
 @router.get("/anomalies", response_model=List[AuditResult])
-async def get_drugs_with_anomalies(db=Depends(get_database)):
+async def get_drugs_with_anomalies(
+    response: Response,
+    limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    db=Depends(get_database),
+    blockchain=Depends(get_blockchain)
+):
     """
     Get all drugs with detected anomalies
     
@@ -86,68 +172,56 @@ async def get_drugs_with_anomalies(db=Depends(get_database)):
     - Incomplete ownership chains
     - Suspicious transfers
     - Hash mismatches
+    
+    - **limit**: Number of drugs to scan for anomalies
+    - **after**: Cursor from the X-Next-Cursor header of the previous page
     """
+    try:
+        page_filter = cursor_filter(after)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
     try:
         anomalous_drugs = []
+        current_timestamp = int(time.time())
         
-        # Get all drugs
-        drugs_cursor = db.drug_composition_storage.find({})
-        drugs = await drugs_cursor.to_list(length=1000)
+        # Stream one page of drugs, verifying them in fixed-size batches
+        drugs_cursor = db.drug_composition_storage.find(
+            page_filter,
+            {
+                "batchId": 1,
+                "expiryDate": 1,
+                "drugName": 1,
+                "manufacturer": 1,
+                "currentOwner": 1,
+                "transferCount": 1
+            },
+            batch_size=200
+        ).sort("_id", 1).limit(limit)
         
-        import time
-        current_timestamp = int(time.time())
+        scanned = 0
+        last_id = None
+        batch = []
         
-        for drug in drugs:
-            batch_id = drug.get("batchId")
-            has_anomaly = False
-            anomaly_type = "None"
-            
-            # Check expiry
-            if drug.get("expiryDate", 0) < current_timestamp:
-                has_anomaly = True
-                anomaly_type = "Expired"
+        async for drug in drugs_cursor:
+            scanned += 1
+            last_id = drug["_id"]
+            batch.append(drug)
             
-            # Verify on blockchain
-            try:
-                verification = await blockchain_service.verify_drug(batch_id)
-                
-                if verification.get("success"):
-                    transfer_count = verification.get("transferCount", 0)
-                    
-                    # Check for incomplete chain
-                    if transfer_count < 2 and not has_anomaly:
-                        has_anomaly = True
-                        anomaly_type = "Incomplete ownership chain"
-                    
-                    if has_anomaly:
-                        anomalous_drugs.append({
-                            "batchId": batch_id,
-                            "hasAnomalies": True,
-                            "anomalyType": anomaly_type,
-                            "ownershipCount": transfer_count,
-                            "drugName": drug.get("drugName", "Unknown"),
-                            "manufacturer": drug.get("manufacturer", "Unknown"),
-                            "currentOwner": verification.get("currentOwner", "Unknown")
-                        })
-                else:
-                    # Blockchain verification failed
-                    anomalous_drugs.append({
-                        "batchId": batch_id,
-                        "hasAnomalies": True,
-                        "anomalyType": "Blockchain verification failed",
-                        "ownershipCount": 0,
-                        "drugName": drug.get("drugName", "Unknown"),
-                        "manufacturer": drug.get("manufacturer", "Unknown"),
-                        "currentOwner": "Unknown"
-                    })
-            except Exception as verify_error:
-                logger.warning(f"Verification error for {batch_id}: {str(verify_error)}")
-                continue
+            if len(batch) == ANOMALY_VERIFY_BATCH:
+                anomalous_drugs.extend(await _find_anomalies(db, blockchain, batch, current_timestamp))
+                batch = []
+        
+        if batch:
+            anomalous_drugs.extend(await _find_anomalies(db, blockchain, batch, current_timestamp))
+        
+        if scanned == limit:
+            response.headers[NEXT_CURSOR_HEADER] = str(last_id)
         
         return anomalous_drugs
         
     except Exception as e:
-        logger.error(f"Get anomalies error: {str(e)}")
+        logger.error("Get anomalies error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to retrieve anomalies: {str(e)}"
@@ -155,40 +229,57 @@ async def get_drugs_with_anomalies(db=Depends(get_database)):
 
 
 @router.get("/expired-drugs")
-async def get_expired_drugs(db=Depends(get_database)):
+async def get_expired_drugs(
+    limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    db=Depends(get_database)
+):
     """
     Get list of all expired drugs
+    
+    - **limit**: Maximum number of drugs to return
+    - **after**: nextCursor returned with the previous page
     """
     try:
-        import time
+        page_filter = cursor_filter(after)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    try:
         current_timestamp = int(time.time())
         
         # Find expired drugs
-        expired_drugs_cursor = db.drug_composition_storage.find({
-            "expiryDate": {"$lt": current_timestamp}
-        })
-        
-        expired_drugs = await expired_drugs_cursor.to_list(length=1000)
-        
-        result = []
-        for drug in expired_drugs:
-            drug.pop("_id", None)
-            result.append({
-                "batchId": drug.get("batchId"),
-                "drugName": drug.get("drugName"),
-                "manufacturer": drug.get("manufacturer"),
-                "expiryDate": drug.get("expiryDate"),
-                "daysExpired": (current_timestamp - drug.get("expiryDate", 0)) // 86400
-            })
+        # Compute daysExpired server-side so documents can be returned as-is
+        expired_drugs_cursor = await db.drug_composition_storage.aggregate([
+            {"$match": {"expiryDate": {"$lt": current_timestamp}, **page_filter}},
+            {"$sort": {"_id": 1}},
+            {"$limit": limit},
+            {"$project": {
+                "batchId": 1,
+                "drugName": 1,
+                "manufacturer": 1,
+                "expiryDate": 1,
+                "daysExpired": {"$toLong": {"$floor": {"$divide": [
+                    {"$subtract": [current_timestamp, "$expiryDate"]}, 86400
+                ]}}}
+            }}
+        ])
+        
+        result = await expired_drugs_cursor.to_list(length=limit)
+        cursor = next_cursor(result, limit)
+        
+        for drug in result:
+            del drug["_id"]
         
         return {
             "success": True,
             "count": len(result),
-            "expiredDrugs": result
+            "expiredDrugs": result,
+            "nextCursor": cursor
         }
         
     except Exception as e:
-        logger.error(f"Get expired drugs error: {str(e)}")
+        logger.error("Get expired drugs error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to retrieve expired drugs: {str(e)}"
@@ -196,31 +287,64 @@ async def get_expired_drugs(db=Depends(get_database)):
 
 
 @router.get("/user-activity/{wallet_address}")
-async def get_user_activity(wallet_address: str, db=Depends(get_database)):
+async def get_user_activity(
+    wallet_address: str,
+    limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    db=Depends(get_database)
+):
     """
     Get activity log for a specific user (for auditing)
+    
+    - **limit**: Maximum number of registered drugs to return
+    - **after**: nextCursor returned with the previous page
     """
     try:
-        user = await db.users.find_one({"walletAddress": wallet_address})
+        page_filter = cursor_filter(after)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    try:
+        # Fetch the user and the drugs they registered in one round-trip
+        drugs_lookup = {
+            "from": "drug_composition_storage",
+            "localField": "walletAddress",
+            "foreignField": "manufacturer"
+        }
+        activity_cursor = await db.users.aggregate([
+            {"$match": {"walletAddress": wallet_address.lower()}},
+            {"$project": {"walletAddress": 1, "role": 1}},
+            {"$lookup": {**drugs_lookup, "as": "drugCount", "pipeline": [
+                {"$count": "n"}
+            ]}},
+            {"$lookup": {**drugs_lookup, "as": "drugs", "pipeline": [
+                {"$match": page_filter},
+                {"$sort": {"_id": 1}},
+                {"$limit": limit},
+                {"$project": {"batchId": 1, "drugName": 1, "registrationTimestamp": 1}}
+            ]}}
+        ])
+        activity = await activity_cursor.to_list(length=1)
         
-        if not user:
+        if not activity:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found"
             )
         
-        # Find all drugs registered by this manufacturer
+        user = activity[0]
+        
+        # Report the drugs registered by this manufacturer
         if user.get("role") == "MANUFACTURER":
-            drugs_cursor = db.drug_composition_storage.find({
-                "manufacturer": wallet_address
-            })
-            drugs = await drugs_cursor.to_list(length=1000)
+            drugs = user["drugs"]
+            total_drugs = user["drugCount"][0]["n"] if user["drugCount"] else 0
             
             return {
                 "success": True,
                 "walletAddress": wallet_address,
                 "role": user.get("role"),
-                "totalDrugsRegistered": len(drugs),
+                "totalDrugsRegistered": total_drugs,
+                "nextCursor": next_cursor(drugs, limit),
                 "drugs": [
                     {
                         "batchId": d.get("batchId"),
@@ -241,7 +365,7 @@ async def get_user_activity(wallet_address: str, db=Depends(get_database)):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Get user activity error: {str(e)}")
+        logger.error("Get user activity error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to retrieve user activity: {str(e)}"
@@ -1,15 +1,26 @@
 """
 Authentication and User Management Routes
 """
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, Response, status
 from app.schemas import UserCreate, UserResponse, SuccessResponse
 from app.database import get_database
-from typing import List
+from app.utils import cursor_filter, next_cursor, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
+from pymongo.errors import DuplicateKeyError
+from typing import List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
+# Fields returned for a user, matching UserResponse
+USER_PROJECTION = {
+    "walletAddress": 1,
+    "role": 1,
+    "name": 1,
+    "isRegistered": 1,
+    "registrationTimestamp": 1
+}
+
 
 @router.post("/register", response_model=SuccessResponse)
 async def register_user(user: UserCreate, db=Depends(get_database)):
@@ -21,15 +32,6 @@ async def register_user(user: UserCreate, db=Depends(get_database)):
     - **name**: User or organization name
     """
     try:
-        # Check if user already exists
-        existing_user = await db.users.find_one({"walletAddress": user.walletAddress})
-        
-        if existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="User with this wallet address already registered"
-            )
-        
         # Create user document
         user_doc = {
             "walletAddress": user.walletAddress,
@@ -39,10 +41,16 @@ async def register_user(user: UserCreate, db=Depends(get_database)):
             "registrationTimestamp": None  # Will be set when registered on blockchain
         }
         
-        # Insert into database
-        result = await db.users.insert_one(user_doc)
+        # Insert into database; the unique walletAddress index rejects duplicates
+        try:
+            result = await db.users.insert_one(user_doc)
+        except DuplicateKeyError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="User with this wallet address already registered"
+            )
         
-        logger.info(f"User registered: {user.walletAddress} as {user.role}")
+        logger.info("User registered: %s as %s", user.walletAddress, user.role)
         
         return {
             "success": True,
@@ -57,7 +65,7 @@ async def register_user(user: UserCreate, db=Depends(get_database)):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"User registration error: {str(e)}")
+        logger.error("User registration error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"User registration failed: {str(e)}"
@@ -70,7 +78,11 @@ async def get_user(wallet_address: str, db=Depends(get_database)):
     Get user details by wallet address
     """
     try:
-        user = await db.users.find_one({"walletAddress": wallet_address})
+        # Stored addresses are lowercase
+        user = await db.users.find_one(
+            {"walletAddress": wallet_address.lower()},
+            {**USER_PROJECTION, "_id": 0}
+        )
         
         if not user:
             raise HTTPException(
@@ -78,18 +90,12 @@ async def get_user(wallet_address: str, db=Depends(get_database)):
                 detail="User not found"
             )
         
-        return {
-            "walletAddress": user["walletAddress"],
-            "role": user["role"],
-            "name": user["name"],
-            "isRegistered": user["isRegistered"],
-            "registrationTimestamp": user.get("registrationTimestamp")
-        }
+        return user
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Get user error: {str(e)}")
+        logger.error("Get user error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to retrieve user: {str(e)}"
@@ -97,27 +103,36 @@ async def get_user(wallet_address: str, db=Depends(get_database)):
 
 
 @router.get("/users", response_model=List[UserResponse])
-async def get_all_users(db=Depends(get_database)):
+async def get_all_users(
+    response: Response,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    db=Depends(get_database)
+):
     """
     Get all registered users (Admin/Regulator only in production)
+    
+    - **limit**: Maximum number of users to return
+    - **after**: Cursor from the X-Next-Cursor header of the previous page
     """
     try:
-        users_cursor = db.users.find({})
-        users = await users_cursor.to_list(length=100)
+        page_filter = cursor_filter(after)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    try:
+        users_cursor = db.users.find(page_filter, USER_PROJECTION).sort("_id", 1).limit(limit)
+        users = await users_cursor.to_list(length=limit)
         
-        return [
-            {
-                "walletAddress": user["walletAddress"],
-                "role": user["role"],
-                "name": user["name"],
-                "isRegistered": user["isRegistered"],
-                "registrationTimestamp": user.get("registrationTimestamp")
-            }
-            for user in users
-        ]
+        cursor = next_cursor(users, limit)
+        if cursor:
+            response.headers[NEXT_CURSOR_HEADER] = cursor
+        
+        # _id is kept for the cursor; response_model drops it on serialization
+        return users
         
     except Exception as e:
-        logger.error(f"Get all users error: {str(e)}")
+        logger.error("Get all users error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to retrieve users: {str(e)}"
@@ -6,19 +6,44 @@ from fastapi import APIRouter, HTTPException, Depends, status
 from app.schemas import (
     DrugRegistrationRequest,
     DrugRegistrationResponse,
+    BulkDrugRegistrationResponse,
     OwnershipTransferRequest,
     OwnershipTransferResponse,
     CompositionValidationRequest,
     CompositionValidationResponse
 )
 from app.database import get_database
-from app.utils import generate_composition_hash, blockchain_service, validate_composition
+from app.utils import (
+    batch_id_topic,
+    generate_composition_hash,
+    generate_composition_hashes,
+    get_blockchain,
+    validate_composition,
+    get_standard_composition,
+    get_standard_compositions
+)
 from datetime import datetime
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from typing import Dict, List
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/drugs", tags=["Drugs"])
 
+# Maximum number of batches accepted by one bulk registration
+MAX_BULK_REGISTRATION = 1000
+
+# MongoDB error code for a unique index violation
+DUPLICATE_KEY_ERROR = 11000
+
+# Allowed (from role, to role) ownership transfers along the supply chain
+VALID_TRANSFERS = frozenset({
+    ("MANUFACTURER", "DISTRIBUTOR"),
+    ("DISTRIBUTOR", "PHARMACY"),
+    ("DISTRIBUTOR", "DISTRIBUTOR")
+})
+
 
 @router.post("/validate-composition", response_model=CompositionValidationResponse)
 async def validate_drug_composition(
@@ -33,11 +58,9 @@ async def validate_drug_composition(
     """
     try:
         # Fetch standard composition from dataset
-        dataset_entry = await db.drug_composition_dataset.find_one(
-            {"drugName": request.drugName}
-        )
+        standard_composition = await get_standard_composition(db, request.drugName)
         
-        if not dataset_entry:
+        if standard_composition is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"No standard composition found for drug: {request.drugName}"
@@ -46,8 +69,8 @@ async def validate_drug_composition(
         # Validate composition
         is_valid, message, details = await validate_composition(
             request.drugName,
-            request.composition.dict(),
-            dataset_entry.get("standardComposition", {})
+            request.composition.model_dump(),
+            standard_composition
         )
         
         return {
@@ -71,8 +94,8 @@ async def validate_drug_composition(
 @router.post("/register", response_model=DrugRegistrationResponse)
 async def register_drug(
     drug_data: DrugRegistrationRequest,
-    db=Depends(get_database)
-    
+    db=Depends(get_database),
+    blockchain=Depends(get_blockchain)
 ):
     """
     Register a new drug batch on the blockchain
@@ -91,9 +114,12 @@ async def register_drug(
     - **manufacturerAddress**: Manufacturer's wallet address
     """
     try:
+        composition = drug_data.composition.model_dump()
+        
         # Check if batch ID already exists
         existing_batch = await db.drug_composition_storage.find_one(
-            {"batchId": drug_data.batchId}
+            {"batchId": drug_data.batchId},
+            {"_id": 1}
         )
         
         if existing_batch:
@@ -104,7 +130,8 @@ async def register_drug(
         
         # Validate manufacturer
         manufacturer = await db.users.find_one(
-            {"walletAddress": drug_data.manufacturerAddress}
+            {"walletAddress": drug_data.manufacturerAddress},
+            {"role": 1}
         )
         
         if not manufacturer or manufacturer.get("role") != "MANUFACTURER":
@@ -114,15 +141,13 @@ async def register_drug(
             )
         
         # Validate composition against dataset
-        dataset_entry = await db.drug_composition_dataset.find_one(
-            {"drugName": drug_data.drugName}
-        )
+        standard_composition = await get_standard_composition(db, drug_data.drugName)
         
-        if dataset_entry:
+        if standard_composition is not None:
             is_valid, message, _ = await validate_composition(
                 drug_data.drugName,
-                drug_data.composition.dict(),
-                dataset_entry.get("standardComposition", {})
+                composition,
+                standard_composition
             )
             
             if not is_valid:
@@ -132,10 +157,10 @@ async def register_drug(
                 )
         
         # Generate composition hash
-        composition_hash = generate_composition_hash(drug_data.composition.dict())
+        composition_hash = generate_composition_hash(composition)
         
         # Register on blockchain (build transaction)
-        blockchain_result = await blockchain_service.register_drug(
+        blockchain_result = await blockchain.register_drug(
             batch_id=drug_data.batchId,
             drug_name=drug_data.drugName,
             composition_hash=composition_hash,
@@ -153,29 +178,48 @@ async def register_drug(
         # Store full composition in MongoDB (off-chain)
         composition_doc = {
             "batchId": drug_data.batchId,
+            "batchIdTopic": batch_id_topic(drug_data.batchId),
             "drugName": drug_data.drugName,
-            "fullComposition": drug_data.composition.dict(),
+            "fullComposition": composition,
             "compositionHash": composition_hash,
             "manufacturer": drug_data.manufacturerAddress,
             "manufactureDate": drug_data.manufactureDate,
             "expiryDate": drug_data.expiryDate,
-            "registrationTimestamp": datetime.utcnow()
+            "registrationTimestamp": datetime.utcnow(),
+            # Denormalized ownership state (registration is the first record)
+            "currentOwner": drug_data.manufacturerAddress,
+            "transferCount": 1
         }
         
-        await db.drug_composition_storage.insert_one(composition_doc)
         # ✅ Store batch master record
-        await db.drug_batches.insert_one({
+        batch_doc = {
             "batchId": drug_data.batchId,
             "drugName": drug_data.drugName,
-            "manufacturer": drug_data.manufacturerAddress.lower(),
-            "currentOwner": drug_data.manufacturerAddress.lower(),
+            "manufacturer": drug_data.manufacturerAddress,
+            "currentOwner": drug_data.manufacturerAddress,
             "status": "ACTIVE",
             "manufactureDate": drug_data.manufactureDate,
             "expiryDate": drug_data.expiryDate,
             "createdAt": datetime.utcnow(),
             "updatedAt": datetime.utcnow()
-        })
-
+        }
+        
+        # Store the composition first; its unique batchId index settles a
+        # concurrent registration of the same batch before any batch record
+        try:
+            await db.drug_composition_storage.insert_one(composition_doc)
+        except DuplicateKeyError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Batch ID already exists"
+            )
+        
+        try:
+            await db.drug_batches.insert_one(batch_doc)
+        except Exception:
+            # Remove the composition left without a batch master record
+            await db.drug_composition_storage.delete_one({"batchId": drug_data.batchId})
+            raise
         
         logger.info(f"Drug registered: {drug_data.batchId} by {drug_data.manufacturerAddress}")
         
@@ -184,7 +228,8 @@ async def register_drug(
             "message": "Drug registered successfully. Sign the transaction in MetaMask.",
             "batchId": drug_data.batchId,
             "compositionHash": composition_hash,
-            "transactionHash": None  # Will be set after user signs in frontend
+            "transactionHash": None,  # Will be set after user signs in frontend
+            "transaction": blockchain_result.get("transaction")
         }
         
     except HTTPException:
@@ -197,10 +242,231 @@ async def register_drug(
         )
 
 
+async def _insert_many_unordered(collection, docs: List[dict]) -> Dict[int, str]:
+    """
+    Insert documents without stopping at the first failure
+    
+    Args:
+        collection: Target collection
+        docs: Documents to insert
+        
+    Returns:
+        Error message of each document that was not inserted, by index in docs
+    """
+    try:
+        await collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        return {
+            error["index"]: (
+                "Batch ID already exists" if error.get("code") == DUPLICATE_KEY_ERROR
+                else f"Database write failed: {error.get('errmsg')}"
+            )
+            for error in e.details.get("writeErrors", [])
+        }
+    return {}
+
+
+def _record_insert_errors(insert_errors: Dict[int, str], indices: List[int], errors: Dict[int, str]):
+    """Map insert errors for a subset of the request back to request indices"""
+    for position, message in insert_errors.items():
+        errors[indices[position]] = message
+
+
+@router.post("/register-bulk", response_model=BulkDrugRegistrationResponse)
+async def register_drugs_bulk(
+    drugs: List[DrugRegistrationRequest],
+    db=Depends(get_database),
+    blockchain=Depends(get_blockchain)
+):
+    """
+    Register several drug batches at once
+    
+    Applies the same checks as /register to every batch. Registration is
+    best-effort: valid batches are registered even if others fail, and each
+    result reports the outcome for its batch.
+    """
+    if not drugs:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one drug batch is required"
+        )
+    
+    if len(drugs) > MAX_BULK_REGISTRATION:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BULK_REGISTRATION} drug batches can be registered at once"
+        )
+    
+    try:
+        batch_ids = [drug.batchId for drug in drugs]
+        
+        if len(set(batch_ids)) != len(batch_ids):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Duplicate batch IDs in request"
+            )
+        
+        # Failure message of each batch that cannot be registered, by index
+        errors = {}
+        
+        # Check which batch IDs already exist
+        existing_cursor = db.drug_composition_storage.find(
+            {"batchId": {"$in": batch_ids}},
+            {"batchId": 1}
+        )
+        existing = {
+            doc["batchId"]
+            for doc in await existing_cursor.to_list(length=len(batch_ids))
+        }
+        
+        # Validate manufacturers
+        manufacturer_addresses = list({drug.manufacturerAddress for drug in drugs})
+        manufacturers_cursor = db.users.find(
+            {"walletAddress": {"$in": manufacturer_addresses}, "role": "MANUFACTURER"},
+            {"walletAddress": 1},
+            batch_size=len(manufacturer_addresses)
+        )
+        manufacturers = {
+            user["walletAddress"]
+            for user in await manufacturers_cursor.to_list(length=len(manufacturer_addresses))
+        }
+        
+        compositions = [drug.composition.model_dump() for drug in drugs]
+        dataset = await get_standard_compositions(db, [drug.drugName for drug in drugs])
+        
+        for index, (drug, composition) in enumerate(zip(drugs, compositions)):
+            if drug.batchId in existing:
+                errors[index] = "Batch ID already exists"
+            elif drug.manufacturerAddress not in manufacturers:
+                errors[index] = "Only registered manufacturers can register drugs"
+            elif drug.drugName in dataset:
+                # Validate composition against dataset
+                is_valid, message, _ = await validate_composition(
+                    drug.drugName,
+                    composition,
+                    dataset[drug.drugName]
+                )
+                
+                if not is_valid:
+                    errors[index] = f"Composition validation failed: {message}"
+        
+        # Generate composition hashes
+        composition_hashes = generate_composition_hashes(compositions)
+        
+        # Register on blockchain (build transactions)
+        transactions = {}
+        pending = [index for index in range(len(drugs)) if index not in errors]
+        
+        if pending:
+            blockchain_results = await blockchain.register_drugs_batch([
+                {
+                    "batch_id": drugs[index].batchId,
+                    "drug_name": drugs[index].drugName,
+                    "composition_hash": composition_hashes[index],
+                    "manufacture_date": drugs[index].manufactureDate,
+                    "expiry_date": drugs[index].expiryDate,
+                    "manufacturer_address": drugs[index].manufacturerAddress
+                }
+                for index in pending
+            ])
+            
+            for index, blockchain_result in zip(pending, blockchain_results):
+                if blockchain_result.get("success"):
+                    transactions[index] = blockchain_result["transaction"]
+                else:
+                    errors[index] = f"Blockchain registration failed: {blockchain_result.get('error')}"
+        
+        # Store full compositions in MongoDB; a batch whose composition insert
+        # fails (e.g. registered concurrently) gets no batch master record
+        now = datetime.utcnow()
+        pending = [index for index in range(len(drugs)) if index not in errors]
+        
+        if pending:
+            composition_docs = [
+                {
+                    "batchId": drugs[index].batchId,
+                    "batchIdTopic": batch_id_topic(drugs[index].batchId),
+                    "drugName": drugs[index].drugName,
+                    "fullComposition": compositions[index],
+                    "compositionHash": composition_hashes[index],
+                    "manufacturer": drugs[index].manufacturerAddress,
+                    "manufactureDate": drugs[index].manufactureDate,
+                    "expiryDate": drugs[index].expiryDate,
+                    "registrationTimestamp": now,
+                    "currentOwner": drugs[index].manufacturerAddress,
+                    "transferCount": 1
+                }
+                for index in pending
+            ]
+            _record_insert_errors(
+                await _insert_many_unordered(db.drug_composition_storage, composition_docs),
+                pending,
+                errors
+            )
+        
+        # Store batch master records
+        pending = [index for index in pending if index not in errors]
+        
+        if pending:
+            batch_docs = [
+                {
+                    "batchId": drugs[index].batchId,
+                    "drugName": drugs[index].drugName,
+                    "manufacturer": drugs[index].manufacturerAddress,
+                    "currentOwner": drugs[index].manufacturerAddress,
+                    "status": "ACTIVE",
+                    "manufactureDate": drugs[index].manufactureDate,
+                    "expiryDate": drugs[index].expiryDate,
+                    "createdAt": now,
+                    "updatedAt": now
+                }
+                for index in pending
+            ]
+            batch_errors = await _insert_many_unordered(db.drug_batches, batch_docs)
+            _record_insert_errors(batch_errors, pending, errors)
+            
+            # Remove compositions left without a batch master record
+            if batch_errors:
+                await db.drug_composition_storage.delete_many({
+                    "batchId": {"$in": [batch_docs[position]["batchId"] for position in batch_errors]}
+                })
+        
+        registered = len(drugs) - len(errors)
+        logger.info(f"Bulk registered {registered} of {len(drugs)} drugs")
+        
+        return {
+            "success": registered > 0,
+            "message": f"Registered {registered} of {len(drugs)} drugs. "
+                       "Sign the transactions in MetaMask.",
+            "count": registered,
+            "results": [
+                {
+                    "success": index not in errors,
+                    "message": errors.get(index, "Drug registered successfully"),
+                    "batchId": drug.batchId,
+                    "compositionHash": composition_hash,
+                    "transactionHash": None,
+                    "transaction": transactions.get(index) if index not in errors else None
+                }
+                for index, (drug, composition_hash) in enumerate(zip(drugs, composition_hashes))
+            ]
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Bulk drug registration error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Bulk drug registration failed: {str(e)}"
+        )
+
+
 @router.post("/transfer", response_model=OwnershipTransferResponse)
 async def transfer_ownership(
     transfer_data: OwnershipTransferRequest,
-    db=Depends(get_database)
+    db=Depends(get_database),
+    blockchain=Depends(get_blockchain)
 ):
     """
     Transfer drug ownership to another party
@@ -211,23 +477,18 @@ async def transfer_ownership(
     - **location**: Transfer location
     """
     try:
-        # Validate batch exists
-        batch = await db.drug_batches.find_one(
-            {"batchId": transfer_data.batchId }
+        # Addresses arrive lowercased by the request schema
+        from_address = transfer_data.fromAddress
+        to_address = transfer_data.toAddress
+        
+        # Fetch the batch and both users concurrently
+        batch, from_user, to_user = await asyncio.gather(
+            db.drug_batches.find_one({"batchId": transfer_data.batchId}, {"_id": 1}),
+            db.users.find_one({"walletAddress": from_address}, {"role": 1}),
+            db.users.find_one({"walletAddress": to_address}, {"role": 1})
         )
-
-        # ✅ Update current owner in DB
-        await db.drug_batches.update_one(
-            {"batchId": transfer_data.batchId},
-            {
-                "$set": {
-                    "currentOwner": transfer_data.toAddress.lower(),
-                    "updatedAt": datetime.utcnow()
-                }
-            }
-        )
-
         
+        # Validate batch exists
         if not batch:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -235,16 +496,6 @@ async def transfer_ownership(
             )
         
         # Validate users
-        from_address = transfer_data.fromAddress.lower()
-        to_address = transfer_data.toAddress.lower()
-
-        from_user = await db.users.find_one(
-            {"walletAddress": from_address}
-        )
-        to_user = await db.users.find_one(
-            {"walletAddress": to_address}
-        )
-
         if not from_user or not to_user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -255,13 +506,7 @@ async def transfer_ownership(
         from_role = from_user.get("role")
         to_role = to_user.get("role")
         
-        valid_transfers = [
-            ("MANUFACTURER", "DISTRIBUTOR"),
-            ("DISTRIBUTOR", "PHARMACY"),
-            ("DISTRIBUTOR", "DISTRIBUTOR")
-        ]
-        
-        if (from_role, to_role) not in valid_transfers:
+        if (from_role, to_role) not in VALID_TRANSFERS:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail=f"Invalid transfer: {from_role} cannot transfer to {to_role}"
@@ -273,7 +518,7 @@ async def transfer_ownership(
         # that both users exist in MongoDB.
         
         # Transfer on blockchain (build transaction)
-        blockchain_result = await blockchain_service.transfer_ownership(
+        blockchain_result = await blockchain.transfer_ownership(
             batch_id=transfer_data.batchId,
             new_owner=transfer_data.toAddress,
             location=transfer_data.location,
@@ -286,6 +531,19 @@ async def transfer_ownership(
                 detail=f"Blockchain transfer failed: {blockchain_result.get('error')}"
             )
         
+        # ✅ Update current owner in DB. The denormalized ownership state in
+        # drug_composition_storage is left to verification, which copies it
+        # from the chain once the signed transaction has been mined.
+        await db.drug_batches.update_one(
+            {"batchId": transfer_data.batchId},
+            {
+                "$set": {
+                    "currentOwner": to_address,
+                    "updatedAt": datetime.utcnow()
+                }
+            }
+        )
+        
         logger.info(
             f"Ownership transferred: {transfer_data.batchId} "
             f"from {transfer_data.fromAddress} to {transfer_data.toAddress}"
@@ -314,7 +572,8 @@ async def get_drug_info(batch_id: str, db=Depends(get_database)):
     Get complete drug information from MongoDB
     """
     try:
-        drug = await db.drug_composition_storage.find_one({"batchId": batch_id})
+        # Exclude the MongoDB _id field
+        drug = await db.drug_composition_storage.find_one({"batchId": batch_id}, {"_id": 0})
         
         if not drug:
             raise HTTPException(
@@ -322,9 +581,6 @@ async def get_drug_info(batch_id: str, db=Depends(get_database)):
                 detail="Batch ID not found"
             )
         
-        # Remove MongoDB _id field
-        drug.pop("_id", None)
-        
         return {
             "success": True,
             "data": drug
@@ -5,16 +5,183 @@ Handles drug authenticity verification and traceability
 from fastapi import APIRouter, HTTPException, Depends, status
 from app.schemas import DrugVerificationResponse, OwnershipRecord
 from app.database import get_database
-from app.utils import blockchain_service, verify_composition_hash
-from typing import List
+from app.utils import (
+    BlockchainService,
+    get_blockchain,
+    verify_composition_hash,
+    hashes_match,
+    chain_state_update,
+    sync_chain_state
+)
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/verify", tags=["Verification"])
 
+# Maximum number of verifications in flight for one batch request
+BATCH_VERIFY_CONCURRENCY = 32
+
+ZERO_ADDRESS = "0x" + "0" * 40
+
+
+async def _fetch_chain_data(
+    blockchain: BlockchainService,
+    batch_id: str
+) -> Tuple[Dict[str, Any], List[dict]]:
+    """
+    Fetch a drug batch and its ownership history from the blockchain
+    
+    Args:
+        blockchain: Blockchain service to query
+        batch_id: Batch identifier
+        
+    Returns:
+        Tuple of (blockchain_result, ownership_history)
+    """
+    # Verify on blockchain
+    blockchain_result = await blockchain.verify_drug(batch_id)
+    
+    if not blockchain_result.get("success"):
+        return blockchain_result, []
+    
+    # Get ownership history
+    history_result = await blockchain.get_drug_history(batch_id)
+    ownership_history = history_result.get("history", []) if history_result.get("success") else []
+    
+    return blockchain_result, ownership_history
+
+
+def _check_batch(
+    blockchain_result: Dict[str, Any],
+    ownership_history: List[dict],
+    composition_data: Optional[dict],
+    current_timestamp: int
+) -> Tuple[str, List[str]]:
+    """
+    Run the verification checks for a drug batch
+    
+    Args:
+        blockchain_result: Drug details from the blockchain
+        ownership_history: Ownership records from the blockchain
+        composition_data: Stored composition document, or None if missing
+        current_timestamp: Reference time for the expiry check
+        
+    Returns:
+        Tuple of (status, anomalies)
+    """
+    if not blockchain_result.get("success"):
+        return "FAKE", ["Batch ID not found on blockchain"]
+    
+    # Analyze results
+    anomalies = []
+    status_text = "GENUINE"
+    
+    # Check if expired
+    if blockchain_result["expiryDate"] < current_timestamp:
+        anomalies.append("Drug has expired")
+        status_text = "EXPIRED"
+    
+    # Check ownership chain completeness
+    if blockchain_result["transferCount"] < 2:
+        anomalies.append("Incomplete ownership chain (expected: Manufacturer → Distributor → Pharmacy)")
+    
+    # Verify composition hash if available
+    if composition_data:
+        stored_hash = composition_data.get("compositionHash", "")
+        blockchain_hash = blockchain_result.get("compositionHash", "")
+        
+        if not hashes_match(stored_hash, blockchain_hash):
+            anomalies.append("Composition hash mismatch - possible tampering")
+            status_text = "FAKE"
+    
+    # Check for role sequence anomalies and zero address transfers in one pass
+    same_role_anomalies = []
+    zero_address_anomalies = []
+    for i, record in enumerate(ownership_history):
+        if i > 0 and record["fromRole"] == record["toRole"]:
+            same_role_anomalies.append(f"Suspicious transfer: same role transfer at index {i}")
+        if record["to"] == ZERO_ADDRESS:
+            zero_address_anomalies.append("Suspicious transfer to zero address detected")
+    
+    anomalies.extend(same_role_anomalies)
+    anomalies.extend(zero_address_anomalies)
+    if zero_address_anomalies:
+        status_text = "FAKE"
+    
+    # Determine final status
+    if len(anomalies) > 0 and status_text == "GENUINE":
+        status_text = "INCOMPLETE_CHAIN"
+    
+    return status_text, anomalies
+
+
+def _verify_batch(
+    batch_id: str,
+    blockchain_result: Dict[str, Any],
+    ownership_history: List[dict],
+    composition_data: Optional[dict]
+) -> dict:
+    """
+    Verify a drug batch against the blockchain and its stored composition
+    
+    Args:
+        batch_id: Batch identifier
+        blockchain_result: Drug details from the blockchain
+        ownership_history: Ownership records from the blockchain
+        composition_data: Stored composition document, or None if missing
+        
+    Returns:
+        Verification result matching DrugVerificationResponse
+    """
+    status_text, anomalies = _check_batch(
+        blockchain_result, ownership_history, composition_data, int(time.time())
+    )
+    
+    if not blockchain_result.get("success"):
+        return {
+            "isGenuine": False,
+            "status": status_text,
+            "batchId": batch_id,
+            "drugName": "Unknown",
+            "manufacturer": "Unknown",
+            "compositionHash": "",
+            "currentOwner": "",
+            "manufactureDate": 0,
+            "expiryDate": 0,
+            "transferCount": 0,
+            "ownershipHistory": [],
+            "anomalies": anomalies
+        }
+    
+    is_genuine = (status_text == "GENUINE")
+    
+    return {
+        "isGenuine": is_genuine,
+        "status": status_text,
+        "batchId": batch_id,
+        "drugName": blockchain_result.get("drugName", "Unknown"),
+        "manufacturer": blockchain_result.get("manufacturer", "Unknown"),
+        "compositionHash": blockchain_result.get("compositionHash", ""),
+        "currentOwner": blockchain_result.get("currentOwner", ""),
+        "manufactureDate": blockchain_result.get("manufactureDate", 0),
+        "expiryDate": blockchain_result.get("expiryDate", 0),
+        "transferCount": blockchain_result.get("transferCount", 0),
+        # get_drug_history already returns records in the response shape
+        "ownershipHistory": ownership_history,
+        "composition": composition_data.get("fullComposition") if composition_data else None,
+        "anomalies": anomalies
+    }
+
 
 @router.get("/{batch_id}", response_model=DrugVerificationResponse)
-async def verify_drug(batch_id: str, db=Depends(get_database)):
+async def verify_drug(
+    batch_id: str,
+    db=Depends(get_database),
+    blockchain=Depends(get_blockchain)
+):
     """
     Verify drug authenticity and get complete traceability
     
@@ -32,101 +199,18 @@ async def verify_drug(batch_id: str, db=Depends(get_database)):
     - INCOMPLETE_CHAIN: Missing ownership transfers
     """
     try:
-        # Verify on blockchain
-        blockchain_result = await blockchain_service.verify_drug(batch_id)
-        
-        if not blockchain_result.get("success"):
-            return {
-                "isGenuine": False,
-                "status": "FAKE",
-                "batchId": batch_id,
-                "drugName": "Unknown",
-                "manufacturer": "Unknown",
-                "compositionHash": "",
-                "currentOwner": "",
-                "manufactureDate": 0,
-                "expiryDate": 0,
-                "transferCount": 0,
-                "ownershipHistory": [],
-                "anomalies": ["Batch ID not found on blockchain"]
-            }
-        
-        # Get ownership history
-        history_result = await blockchain_service.get_drug_history(batch_id)
-        ownership_history = history_result.get("history", []) if history_result.get("success") else []
-        
-        # Get composition from MongoDB
-        composition_data = await db.drug_composition_storage.find_one({"batchId": batch_id})
-        
-        # Analyze results
-        anomalies = []
-        status_text = "GENUINE"
-        
-        # Check if expired
-        import time
-        current_timestamp = int(time.time())
+        # Query the blockchain and get the composition from MongoDB concurrently
+        (blockchain_result, ownership_history), composition_data = await asyncio.gather(
+            _fetch_chain_data(blockchain, batch_id),
+            db.drug_composition_storage.find_one(
+                {"batchId": batch_id},
+                {"compositionHash": 1, "fullComposition": 1, "currentOwner": 1, "transferCount": 1}
+            )
+        )
         
-        if blockchain_result["expiryDate"] < current_timestamp:
-            anomalies.append("Drug has expired")
-            status_text = "EXPIRED"
-        
-        # Check ownership chain completeness
-        if blockchain_result["transferCount"] < 2:
-            anomalies.append("Incomplete ownership chain (expected: Manufacturer → Distributor → Pharmacy)")
-        
-        # Verify composition hash if available
-        if composition_data:
-            stored_hash = composition_data.get("compositionHash", "")
-            blockchain_hash = blockchain_result.get("compositionHash", "")
-            
-            if stored_hash.lower() != blockchain_hash.lower():
-                anomalies.append("Composition hash mismatch - possible tampering")
-                status_text = "FAKE"
-        
-        # Check for role sequence anomalies
-        for i in range(1, len(ownership_history)):
-            if ownership_history[i]["fromRole"] == ownership_history[i]["toRole"]:
-                anomalies.append(f"Suspicious transfer: same role transfer at index {i}")
-        
-        # Check for zero address transfers
-        for record in ownership_history:
-            if record["to"] == "0x0000000000000000000000000000000000000000":
-                anomalies.append("Suspicious transfer to zero address detected")
-                status_text = "FAKE"
-        
-        # Determine final status
-        if len(anomalies) > 0 and status_text == "GENUINE":
-            status_text = "INCOMPLETE_CHAIN"
-        
-        is_genuine = (status_text == "GENUINE")
-        
-        # Format ownership history
-        formatted_history = []
-        for record in ownership_history:
-            formatted_history.append({
-                "from": record["from"],
-                "to": record["to"],
-                "timestamp": record["timestamp"],
-                "location": record["location"],
-                "fromRole": record["fromRole"],
-                "toRole": record["toRole"]
-            })
+        await sync_chain_state(db, [chain_state_update(batch_id, composition_data, blockchain_result)])
         
-        return {
-            "isGenuine": is_genuine,
-            "status": status_text,
-            "batchId": batch_id,
-            "drugName": blockchain_result.get("drugName", "Unknown"),
-            "manufacturer": blockchain_result.get("manufacturer", "Unknown"),
-            "compositionHash": blockchain_result.get("compositionHash", ""),
-            "currentOwner": blockchain_result.get("currentOwner", ""),
-            "manufactureDate": blockchain_result.get("manufactureDate", 0),
-            "expiryDate": blockchain_result.get("expiryDate", 0),
-            "transferCount": blockchain_result.get("transferCount", 0),
-            "ownershipHistory": formatted_history,
-            "composition": composition_data.get("fullComposition") if composition_data else None,
-            "anomalies": anomalies
-        }
+        return _verify_batch(batch_id, blockchain_result, ownership_history, composition_data)
         
     except Exception as e:
         logger.error(f"Drug verification error: {str(e)}")
@@ -137,12 +221,12 @@ async def verify_drug(batch_id: str, db=Depends(get_database)):
 
 
 @router.get("/history/{batch_id}")
-async def get_ownership_history(batch_id: str):
+async def get_ownership_history(batch_id: str, blockchain=Depends(get_blockchain)):
     """
     Get detailed ownership history for a drug batch
     """
     try:
-        history_result = await blockchain_service.get_drug_history(batch_id)
+        history_result = await blockchain.get_drug_history(batch_id)
         
         if not history_result.get("success"):
             raise HTTPException(
@@ -167,29 +251,74 @@ async def get_ownership_history(batch_id: str):
 
 
 @router.post("/batch-verify")
-async def batch_verify_drugs(batch_ids: List[str], db=Depends(get_database)):
+async def batch_verify_drugs(
+    batch_ids: List[str],
+    db=Depends(get_database),
+    blockchain=Depends(get_blockchain)
+):
     """
     Verify multiple drug batches at once
     Useful for pharmacy bulk verification
     """
     try:
-        results = []
-        
-        for batch_id in batch_ids:
-            try:
-                verification = await verify_drug(batch_id, db)
-                results.append({
-                    "batchId": batch_id,
-                    "isGenuine": verification.isGenuine,
-                    "status": verification.status
-                })
-            except Exception as e:
-                results.append({
-                    "batchId": batch_id,
-                    "isGenuine": False,
-                    "status": "ERROR",
-                    "error": str(e)
-                })
+        # Fetch all stored compositions in a single query, sized so the
+        # server returns them in one batch
+        compositions = {}
+        unique_batch_ids = list(dict.fromkeys(batch_ids))
+        
+        if unique_batch_ids:
+            compositions_cursor = db.drug_composition_storage.find(
+                {"batchId": {"$in": unique_batch_ids}},
+                {
+                    "batchId": 1,
+                    "compositionHash": 1,
+                    "fullComposition": 1,
+                    "currentOwner": 1,
+                    "transferCount": 1
+                },
+                batch_size=len(unique_batch_ids)
+            )
+            compositions = {
+                doc["batchId"]: doc
+                for doc in await compositions_cursor.to_list(length=len(unique_batch_ids))
+            }
+        
+        # All batches are checked for expiry against the same time
+        current_timestamp = int(time.time())
+        semaphore = asyncio.Semaphore(BATCH_VERIFY_CONCURRENCY)
+        ownership_updates = []
+        
+        async def verify_one(batch_id: str) -> dict:
+            async with semaphore:
+                try:
+                    # Only the status is reported, so skip building the full result
+                    blockchain_result, ownership_history = await _fetch_chain_data(blockchain, batch_id)
+                    ownership_updates.append(
+                        chain_state_update(batch_id, compositions.get(batch_id), blockchain_result)
+                    )
+                    status_text, _ = _check_batch(
+                        blockchain_result,
+                        ownership_history,
+                        compositions.get(batch_id),
+                        current_timestamp
+                    )
+                    return {
+                        "batchId": batch_id,
+                        "isGenuine": status_text == "GENUINE",
+                        "status": status_text
+                    }
+                except Exception as e:
+                    logger.error("Drug verification error: %s", e)
+                    return {
+                        "batchId": batch_id,
+                        "isGenuine": False,
+                        "status": "ERROR",
+                        "error": str(e)
+                    }
+        
+        # Verify all batches concurrently
+        results = await asyncio.gather(*(verify_one(batch_id) for batch_id in batch_ids))
+        await sync_chain_state(db, ownership_updates)
         
         return {
             "success": True,
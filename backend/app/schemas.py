@@ -1,10 +1,32 @@
 """
 Pydantic Schemas for Request/Response Validation
 """
-from pydantic import BaseModel, Field, validator
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field, ValidationInfo, field_validator
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 from enum import Enum
+import re
+
+ADDRESS_PATTERN = re.compile(r"^0x[0-9a-f]{40}$")
+
+
+def normalize_address(value: str) -> str:
+    """
+    Normalize an Ethereum address to its lowercase form
+    
+    Args:
+        value: Address in any letter case
+        
+    Returns:
+        Lowercase 0x-prefixed address
+        
+    Raises:
+        ValueError: If the value is not a 20-byte hex address
+    """
+    address = value.strip().lower()
+    if not ADDRESS_PATTERN.match(address):
+        raise ValueError("Invalid Ethereum address")
+    return address
 
 
 class RoleEnum(str, Enum):
@@ -28,7 +50,11 @@ class UserBase(BaseModel):
 
 class UserCreate(UserBase):
     """Schema for creating a new user"""
-    pass
+    
+    @field_validator('walletAddress')
+    @classmethod
+    def validate_wallet_address(cls, v):
+        return normalize_address(v)
 
 
 class UserResponse(UserBase):
@@ -36,8 +62,7 @@ class UserResponse(UserBase):
     isRegistered: bool
     registrationTimestamp: Optional[datetime] = None
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # ============ Drug Composition Schemas ============
@@ -53,7 +78,8 @@ class DrugComposition(BaseModel):
     """Complete drug composition"""
     ingredients: List[DrugIngredient] = Field(..., description="List of ingredients")
     
-    @validator('ingredients')
+    @field_validator('ingredients')
+    @classmethod
     def validate_ingredients(cls, v):
         if not v or len(v) == 0:
             raise ValueError("At least one ingredient is required")
@@ -77,9 +103,15 @@ class DrugRegistrationRequest(BaseModel):
     expiryDate: int = Field(..., description="Expiry date (Unix timestamp)")
     manufacturerAddress: str = Field(..., description="Manufacturer wallet address")
     
-    @validator('expiryDate')
-    def validate_expiry_date(cls, v, values):
-        if 'manufactureDate' in values and v <= values['manufactureDate']:
+    @field_validator('manufacturerAddress')
+    @classmethod
+    def validate_manufacturer_address(cls, v):
+        return normalize_address(v)
+    
+    @field_validator('expiryDate')
+    @classmethod
+    def validate_expiry_date(cls, v, info: ValidationInfo):
+        if 'manufactureDate' in info.data and v <= info.data['manufactureDate']:
             raise ValueError("Expiry date must be after manufacture date")
         return v
 
@@ -91,6 +123,16 @@ class DrugRegistrationResponse(BaseModel):
     batchId: str
     compositionHash: str
     transactionHash: Optional[str] = None
+    # Unsigned transaction for the manufacturer to sign in MetaMask
+    transaction: Optional[Dict[str, Any]] = None
+
+
+class BulkDrugRegistrationResponse(BaseModel):
+    """Schema for bulk drug registration response"""
+    success: bool
+    message: str
+    count: int
+    results: List[DrugRegistrationResponse]
 
 
 # ============ Ownership Transfer Schemas ============
@@ -101,6 +143,11 @@ class OwnershipTransferRequest(BaseModel):
     fromAddress: str = Field(..., description="Current owner address")
     toAddress: str = Field(..., description="New owner address")
     location: str = Field(..., min_length=1, description="Transfer location")
+    
+    @field_validator('fromAddress', 'toAddress')
+    @classmethod
+    def validate_addresses(cls, v):
+        return normalize_address(v)
 
 
 class OwnershipTransferResponse(BaseModel):
@@ -122,8 +169,7 @@ class OwnershipRecord(BaseModel):
     fromRole: str
     toRole: str
     
-    class Config:
-        populate_by_name = True
+    model_config = ConfigDict(populate_by_name=True)
 
 
 class DrugVerificationResponse(BaseModel):
@@ -1,13 +1,43 @@
 """
 Utility functions package
 """
-from .hashing import generate_composition_hash, verify_composition_hash
-from .blockchain import blockchain_service
-from .validation import validate_composition
+from .hashing import (
+    generate_composition_hash,
+    generate_composition_hashes,
+    verify_composition_hash,
+    hashes_match
+)
+from .blockchain import BlockchainService, get_blockchain_service, get_blockchain
+from .validation import (
+    validate_composition,
+    get_standard_composition,
+    get_standard_compositions
+)
+from .ownership import (
+    batch_id_topic,
+    chain_state_update,
+    sync_chain_state,
+    watch_ownership_events
+)
+from .pagination import cursor_filter, next_cursor, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
 
 __all__ = [
     'generate_composition_hash',
+    'generate_composition_hashes',
     'verify_composition_hash',
-    'blockchain_service',
-    'validate_composition'
+    'hashes_match',
+    'BlockchainService',
+    'get_blockchain_service',
+    'get_blockchain',
+    'validate_composition',
+    'get_standard_composition',
+    'get_standard_compositions',
+    'batch_id_topic',
+    'chain_state_update',
+    'sync_chain_state',
+    'watch_ownership_events',
+    'cursor_filter',
+    'next_cursor',
+    'MAX_PAGE_SIZE',
+    'NEXT_CURSOR_HEADER'
 ]
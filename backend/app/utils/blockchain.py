@@ -2,15 +2,248 @@
 Blockchain Interaction Utilities using Web3.py
 Handles all smart contract interactions
 """
-from web3 import Web3
-from web3.middleware import geth_poa_middleware
-from typing import Dict, Any, List, Optional
+from aiohttp import ClientResponseError, ClientSession, ClientTimeout, TCPConnector
+from aiolimiter import AsyncLimiter
+from web3 import AsyncWeb3, AsyncHTTPProvider
+from web3.exceptions import TimeExhausted, TransactionNotFound
+from web3.middleware import async_geth_poa_middleware
+from eth_abi import decode, encode
+from eth_utils import function_signature_to_4byte_selector, keccak, to_checksum_address
+from eth_utils.abi import collapse_if_tuple
+from cachetools import TTLCache
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
 import json
 import logging
+import random
+import time
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of contract calls sent in a single JSON-RPC batch
+RPC_BATCH_SIZE = 100
+
+# Maximum number of contract view requests (batches or single calls) in flight
+VERIFY_CONCURRENCY = 32
+
+# Seconds a view call result is reused; transactions are signed client-side,
+# so a write may land on chain shortly after the backend invalidates it
+VIEW_CACHE_TTL = 5
+VIEW_CACHE_SIZE = 1000
+
+# Seconds the node's gas price is reused across built transactions
+GAS_PRICE_TTL = 2
+
+# Transaction receipt polling: first delay, maximum delay and overall timeout
+RECEIPT_POLL_INITIAL = 0.1
+RECEIPT_POLL_MAX = 5.0
+RECEIPT_TIMEOUT = 30
+
+# Retries of an RPC request rejected by the node with HTTP 429
+RPC_MAX_RETRIES = 5
+
+# Contract Role enum values, indexed by enum number
+ENUM_TO_ROLE = ("NONE", "MANUFACTURER", "DISTRIBUTOR", "PHARMACY", "CONSUMER", "REGULATOR")
+ROLE_TO_ENUM = MappingProxyType({
+    "MANUFACTURER": 1,
+    "DISTRIBUTOR": 2,
+    "PHARMACY": 3,
+    "CONSUMER": 4,
+    "REGULATOR": 5
+})
+
+# Contract ABI (simplified - in production, load the full ABI generated by truffle build)
+CONTRACT_ABI = [
+    {
+        "inputs": [
+            {"internalType": "address", "name": "_walletAddress", "type": "address"}
+        ],
+        "name": "getUser",
+        "outputs": [
+            {"internalType": "address", "name": "walletAddress", "type": "address"},
+            {"internalType": "uint8", "name": "role", "type": "uint8"},
+            {"internalType": "string", "name": "name", "type": "string"},
+            {"internalType": "bool", "name": "isRegistered", "type": "bool"},
+            {"internalType": "uint256", "name": "registrationTimestamp", "type": "uint256"}
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [
+            {"internalType": "address", "name": "_walletAddress", "type": "address"},
+            {"internalType": "uint8", "name": "_role", "type": "uint8"},
+            {"internalType": "string", "name": "_name", "type": "string"}
+        ],
+        "name": "registerUser",
+        "outputs": [],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    },
+    {
+        "inputs": [
+            {"internalType": "string", "name": "_batchId", "type": "string"},
+            {"internalType": "string", "name": "_drugName", "type": "string"},
+            {"internalType": "string", "name": "_compositionHash", "type": "string"},
+            {"internalType": "uint256", "name": "_manufactureDate", "type": "uint256"},
+            {"internalType": "uint256", "name": "_expiryDate", "type": "uint256"}
+        ],
+        "name": "registerDrug",
+        "outputs": [],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    },
+    {
+        "inputs": [
+            {"internalType": "string", "name": "_batchId", "type": "string"},
+            {"internalType": "address", "name": "_newOwner", "type": "address"},
+            {"internalType": "string", "name": "_location", "type": "string"}
+        ],
+        "name": "transferOwnership",
+        "outputs": [],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    },
+    {
+        "inputs": [{"internalType": "string", "name": "_batchId", "type": "string"}],
+        "name": "verifyDrug",
+        "outputs": [
+            {"internalType": "bool", "name": "isGenuine", "type": "bool"},
+            {"internalType": "string", "name": "drugName", "type": "string"},
+            {"internalType": "address", "name": "manufacturer", "type": "address"},
+            {"internalType": "string", "name": "compositionHash", "type": "string"},
+            {"internalType": "uint256", "name": "manufactureDate", "type": "uint256"},
+            {"internalType": "uint256", "name": "expiryDate", "type": "uint256"},
+            {"internalType": "address", "name": "currentOwner", "type": "address"},
+            {"internalType": "uint256", "name": "transferCount", "type": "uint256"}
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [{"internalType": "string", "name": "_batchId", "type": "string"}],
+        "name": "getDrugHistory",
+        "outputs": [
+            {
+                "components": [
+                    {"internalType": "address", "name": "from", "type": "address"},
+                    {"internalType": "address", "name": "to", "type": "address"},
+                    {"internalType": "uint256", "name": "timestamp", "type": "uint256"},
+                    {"internalType": "string", "name": "location", "type": "string"},
+                    {"internalType": "uint8", "name": "fromRole", "type": "uint8"},
+                    {"internalType": "uint8", "name": "toRole", "type": "uint8"}
+                ],
+                "internalType": "struct DrugTraceability.OwnershipRecord[]",
+                "name": "",
+                "type": "tuple[]"
+            }
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    }
+]
+
+
+def _view_codec(name: str) -> Tuple[bytes, List[str], List[str]]:
+    """
+    Build the selector and argument/return types of a contract view function
+    
+    Args:
+        name: Function name in CONTRACT_ABI
+        
+    Returns:
+        Tuple of (4-byte selector, input types, output types)
+    """
+    abi = next(item for item in CONTRACT_ABI if item.get('name') == name)
+    input_types = [collapse_if_tuple(param) for param in abi['inputs']]
+    output_types = [collapse_if_tuple(param) for param in abi['outputs']]
+    selector = function_signature_to_4byte_selector(f"{name}({','.join(input_types)})")
+    return selector, input_types, output_types
+
+
+# Pre-encoded hot view calls, sent as raw eth_call without the contract codec
+VERIFY_DRUG_CODEC = _view_codec('verifyDrug')
+GET_DRUG_HISTORY_CODEC = _view_codec('getDrugHistory')
+GET_USER_CODEC = _view_codec('getUser')
+
+# Log topic of OwnershipTransferred(string indexed batchId, address indexed from,
+# address indexed to, string location, uint256 timestamp)
+OWNERSHIP_TRANSFERRED_TOPIC = '0x' + keccak(
+    text='OwnershipTransferred(string,address,address,string,uint256)'
+).hex()
+
+
+async def _send_throttled(limiter: AsyncLimiter, send, label: str) -> Any:
+    """
+    Send one HTTP request to the node under the rate limit, retrying on 429
+    
+    Retries back off exponentially with jitter, so concurrent requests that
+    were rejected together do not all retry at the same moment. The delay is
+    taken outside the limiter so other requests keep flowing.
+    
+    Args:
+        limiter: Shared limiter every request must pass through
+        send: Callable returning a coroutine that performs the request
+        label: RPC method name, for logging
+        
+    Returns:
+        Result of send()
+    """
+    attempt = 0
+    while True:
+        try:
+            async with limiter:
+                return await send()
+        except ClientResponseError as e:
+            if e.status != 429 or attempt == RPC_MAX_RETRIES:
+                raise
+        
+        delay = random.uniform(0.5, 1.5) * 2 ** attempt
+        attempt += 1
+        logger.warning(f"RPC {label} rate limited, retry {attempt} in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+
+def _rate_limit_middleware(limiter: AsyncLimiter):
+    """
+    Build a web3 middleware that throttles RPC requests and retries on HTTP 429
+    
+    Args:
+        limiter: Shared limiter every request must pass through
+        
+    Returns:
+        Async web3 middleware
+    """
+    async def middleware(make_request, async_w3):
+        async def rate_limited_request(method, params):
+            return await _send_throttled(limiter, lambda: make_request(method, params), method)
+        
+        return rate_limited_request
+    
+    return middleware
+
+
+@lru_cache(maxsize=4096)
+def _checksum_lower(address: str) -> str:
+    """Checksum an already lowercased address, memoized per address"""
+    return to_checksum_address(address)
+
+
+def _checksum(address: str) -> str:
+    """
+    Convert an address to its EIP-55 checksum form
+    
+    Args:
+        address: Address in any letter case
+        
+    Returns:
+        Checksummed address
+    """
+    return _checksum_lower(address.lower())
+
 
 class BlockchainService:
     """
@@ -23,26 +256,46 @@ class BlockchainService:
         self.contract = None
         self.contract_address = None
         self.account = None
+        # HTTP session shared by all RPC requests, created on first use
+        self._session: Optional[ClientSession] = None
+        # Recent verifyDrug / getDrugHistory results by batch ID
+        self._verify_cache = TTLCache(maxsize=VIEW_CACHE_SIZE, ttl=VIEW_CACHE_TTL)
+        self._history_cache = TTLCache(maxsize=VIEW_CACHE_SIZE, ttl=VIEW_CACHE_TTL)
+        # (price, fetched_at) of the last eth_gasPrice call
+        self._gas_price_cache = None
+        # Next nonce of the contract owner, tracked locally between sends
+        self._owner_nonce = None
+        # Serializes owner nonce allocation and sending across requests
+        self._owner_lock = asyncio.Lock()
+        # Request rate limit shared by every HTTP request to the node
+        self._limiter = AsyncLimiter(settings.RPC_MAX_RPS, 1)
+        # Bounds concurrent view requests issued by _call_batch
+        self._view_semaphore = asyncio.Semaphore(VERIFY_CONCURRENCY)
         self._initialize_connection()
     
     def _initialize_connection(self):
-        """Initialize Web3 connection to blockchain"""
+        """Create the async Web3 client and contract instance"""
         try:
-            # Connect to blockchain provider (Ganache/local node)
-            self.w3 = Web3(Web3.HTTPProvider(settings.BLOCKCHAIN_PROVIDER_URL))
+            # Blockchain provider (Ganache/local node); no request is sent yet
+            self.w3 = AsyncWeb3(AsyncHTTPProvider(
+                settings.BLOCKCHAIN_PROVIDER_URL,
+                request_kwargs={'timeout': ClientTimeout(total=settings.BLOCKCHAIN_TIMEOUT)}
+            ))
         
-            # Add PoA middleware for Ganache / PoA chains
-            from web3.middleware import geth_poa_middleware
-            self.w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+            # Drop the provider's built-in fixed-delay retry; it would resend
+            # 429 responses immediately, outside the rate limiter
+            self.w3.provider.middlewares = ()
             
-            # Check connection
-            if not self.w3.isConnected():   # note: Web3 7.x uses is_connected()
-                raise ConnectionError("Failed to connect to blockchain")
+            # Add PoA middleware for Ganache / PoA chains
+            self.w3.middleware_onion.inject(async_geth_poa_middleware, layer=0)
             
-            logger.info(f"Connected to blockchain at {settings.BLOCKCHAIN_PROVIDER_URL}")
+            # Stay under the node's request rate limit
+            self.w3.middleware_onion.add(_rate_limit_middleware(self._limiter), name='rate_limit')
             
-            # Set contract address
-            self.contract_address = settings.CONTRACT_ADDRESS
+            # Set contract address, checksummed once for every later use
+            self.contract_address = (
+                _checksum(settings.CONTRACT_ADDRESS) if settings.CONTRACT_ADDRESS else None
+            )
             
             # Load contract ABI and initialize contract
             if self.contract_address:
@@ -53,120 +306,65 @@ class BlockchainService:
             raise
 
     
+    async def connect(self):
+        """
+        Open the RPC connection pool and check the connection to the node
+        
+        Raises:
+            ConnectionError: If the node cannot be reached
+        """
+        await self._get_session()
+        
+        if not await self.w3.is_connected():
+            raise ConnectionError("Failed to connect to blockchain")
+        
+        logger.info(f"Connected to blockchain at {settings.BLOCKCHAIN_PROVIDER_URL}")
+    
+    async def _get_session(self) -> ClientSession:
+        """
+        Get the keep-alive HTTP session shared by all requests to the node
+        
+        Returns:
+            Session, created and handed to the provider on first use
+        """
+        if self._session is None:
+            self._session = ClientSession(
+                connector=TCPConnector(limit=settings.BLOCKCHAIN_MAX_CONNECTIONS),
+                raise_for_status=True
+            )
+            await self.w3.provider.cache_async_session(self._session)
+        return self._session
+    
+    async def close(self):
+        """
+        Close the RPC connection pool
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+    
     def _load_contract(self):
         """Load smart contract ABI and create contract instance"""
         try:
-            # Contract ABI (simplified - load from file in production)
-            contract_abi = self._get_contract_abi()
-            
             # Create contract instance
             self.contract = self.w3.eth.contract(
-                address=Web3.toChecksumAddress(self.contract_address),
-                abi=contract_abi
+                address=self.contract_address,
+                abi=CONTRACT_ABI
             )
             
+            # Bind contract functions once instead of looking them up per call
+            functions = self.contract.functions
+            self._register_user_fn = functions.registerUser
+            self._get_user_fn = functions.getUser
+            self._register_drug_fn = functions.registerDrug
+            self._transfer_ownership_fn = functions.transferOwnership
+            
             logger.info(f"Contract loaded at address: {self.contract_address}")
             
         except Exception as e:
             logger.error(f"Contract loading error: {str(e)}")
             raise
     
-    def _get_contract_abi(self) -> List[Dict]:
-        """
-        Get contract ABI
-        In production, load this from a JSON file generated during contract deployment
-        """
-        # This is a simplified ABI - in production, use the full ABI from truffle build
-        return [
-            {
-                "inputs": [
-                    {"internalType": "address", "name": "_walletAddress", "type": "address"}
-                ],
-                "name": "getUser",
-                "outputs": [
-                    {"internalType": "address", "name": "walletAddress", "type": "address"},
-                    {"internalType": "uint8", "name": "role", "type": "uint8"},
-                    {"internalType": "string", "name": "name", "type": "string"},
-                    {"internalType": "bool", "name": "isRegistered", "type": "bool"},
-                    {"internalType": "uint256", "name": "registrationTimestamp", "type": "uint256"}
-                ],
-                "stateMutability": "view",
-                "type": "function"
-            },
-            {
-                "inputs": [
-                    {"internalType": "address", "name": "_walletAddress", "type": "address"},
-                    {"internalType": "uint8", "name": "_role", "type": "uint8"},
-                    {"internalType": "string", "name": "_name", "type": "string"}
-                ],
-                "name": "registerUser",
-                "outputs": [],
-                "stateMutability": "nonpayable",
-                "type": "function"
-            },
-            {
-                "inputs": [
-                    {"internalType": "string", "name": "_batchId", "type": "string"},
-                    {"internalType": "string", "name": "_drugName", "type": "string"},
-                    {"internalType": "string", "name": "_compositionHash", "type": "string"},
-                    {"internalType": "uint256", "name": "_manufactureDate", "type": "uint256"},
-                    {"internalType": "uint256", "name": "_expiryDate", "type": "uint256"}
-                ],
-                "name": "registerDrug",
-                "outputs": [],
-                "stateMutability": "nonpayable",
-                "type": "function"
-            },
-            {
-                "inputs": [
-                    {"internalType": "string", "name": "_batchId", "type": "string"},
-                    {"internalType": "address", "name": "_newOwner", "type": "address"},
-                    {"internalType": "string", "name": "_location", "type": "string"}
-                ],
-                "name": "transferOwnership",
-                "outputs": [],
-                "stateMutability": "nonpayable",
-                "type": "function"
-            },
-            {
-                "inputs": [{"internalType": "string", "name": "_batchId", "type": "string"}],
-                "name": "verifyDrug",
-                "outputs": [
-                    {"internalType": "bool", "name": "isGenuine", "type": "bool"},
-                    {"internalType": "string", "name": "drugName", "type": "string"},
-                    {"internalType": "address", "name": "manufacturer", "type": "address"},
-                    {"internalType": "string", "name": "compositionHash", "type": "string"},
-                    {"internalType": "uint256", "name": "manufactureDate", "type": "uint256"},
-                    {"internalType": "uint256", "name": "expiryDate", "type": "uint256"},
-                    {"internalType": "address", "name": "currentOwner", "type": "address"},
-                    {"internalType": "uint256", "name": "transferCount", "type": "uint256"}
-                ],
-                "stateMutability": "view",
-                "type": "function"
-            },
-            {
-                "inputs": [{"internalType": "string", "name": "_batchId", "type": "string"}],
-                "name": "getDrugHistory",
-                "outputs": [
-                    {
-                        "components": [
-                            {"internalType": "address", "name": "from", "type": "address"},
-                            {"internalType": "address", "name": "to", "type": "address"},
-                            {"internalType": "uint256", "name": "timestamp", "type": "uint256"},
-                            {"internalType": "string", "name": "location", "type": "string"},
-                            {"internalType": "uint8", "name": "fromRole", "type": "uint8"},
-                            {"internalType": "uint8", "name": "toRole", "type": "uint8"}
-                        ],
-                        "internalType": "struct DrugTraceability.OwnershipRecord[]",
-                        "name": "",
-                        "type": "tuple[]"
-                    }
-                ],
-                "stateMutability": "view",
-                "type": "function"
-            }
-        ]
-    
     async def register_user(
         self,
         wallet_address: str,
@@ -186,14 +384,7 @@ class BlockchainService:
         """
         try:
             # Map role string to enum value
-            role_map = {
-                "MANUFACTURER": 1,
-                "DISTRIBUTOR": 2,
-                "PHARMACY": 3,
-                "CONSUMER": 4,
-                "REGULATOR": 5
-            }
-            role_enum = role_map.get(role.upper(), 0)
+            role_enum = ROLE_TO_ENUM.get(role.upper(), 0)
             
             if role_enum == 0:
                 return {
@@ -210,26 +401,36 @@ class BlockchainService:
             
             contract_owner = self.w3.eth.account.from_key(settings.PRIVATE_KEY)
             
-            # Build transaction from contract owner's account
-            transaction = self.contract.functions.registerUser(
-                Web3.toChecksumAddress(wallet_address),
-                role_enum,
-                name
-            ).build_transaction({
-                'from': contract_owner.address,
-                'nonce': self.w3.eth.get_transaction_count(contract_owner.address),
-                'gas': 300000,
-                'gasPrice': self.w3.eth.gas_price
-            })
-            
-            # Sign transaction with contract owner's private key
-            signed_tx = self.w3.eth.account.sign_transaction(transaction, settings.PRIVATE_KEY)
+            gas_price = await self._gas_price()
             
-            # Send signed transaction
-            tx_hash = self.w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+            # Hold the lock from nonce allocation until the send completes
+            async with self._owner_lock:
+                # Build transaction from contract owner's account
+                transaction = await self._register_user_fn(
+                    _checksum(wallet_address),
+                    role_enum,
+                    name
+                ).build_transaction({
+                    'from': contract_owner.address,
+                    'nonce': await self._next_owner_nonce(contract_owner.address),
+                    'gas': 300000,
+                    'gasPrice': gas_price
+                })
+                
+                # Sign transaction with contract owner's private key
+                signed_tx = self.w3.eth.account.sign_transaction(transaction, settings.PRIVATE_KEY)
+                
+                # Send signed transaction
+                try:
+                    tx_hash = await self.w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+                except Exception:
+                    # The local nonce may be out of sync; re-read it on the next send
+                    self._owner_nonce = None
+                    raise
+                self._owner_nonce = transaction['nonce'] + 1
             
             # Wait for transaction receipt
-            tx_receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=30)
+            tx_receipt = await self._await_receipt(tx_hash)
             
             logger.info(f"User registered on blockchain: {wallet_address} as {role}")
             
@@ -258,8 +459,8 @@ class BlockchainService:
             True if registered, False otherwise
         """
         try:
-            result = self.contract.functions.getUser(
-                Web3.toChecksumAddress(wallet_address)
+            result = await self._get_user_fn(
+                _checksum(wallet_address)
             ).call()
             
             # result[3] is the isRegistered boolean
@@ -292,21 +493,23 @@ class BlockchainService:
         Returns:
             Transaction receipt dictionary
         """
+        self._invalidate_batch(batch_id)
+        
         try:
             # Build transaction
-            transaction = self.contract.functions.registerDrug(
+            transaction = await self._register_drug_fn(
                 batch_id,
                 drug_name,
                 composition_hash,
                 manufacture_date,
                 expiry_date
             ).build_transaction({
-                'from': Web3.toChecksumAddress(manufacturer_address),
-                'nonce': self.w3.eth.get_transaction_count(
-                    Web3.toChecksumAddress(manufacturer_address)
+                'from': _checksum(manufacturer_address),
+                'nonce': await self.w3.eth.get_transaction_count(
+                    _checksum(manufacturer_address)
                 ),
                 'gas': 3000000,
-                'gasPrice': self.w3.eth.gas_price
+                'gasPrice': await self._gas_price()
             })
             
             return {
@@ -322,6 +525,75 @@ class BlockchainService:
                 'error': str(e)
             }
     
+    async def register_drugs_batch(self, drugs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Build registration transactions for several drugs
+        
+        The node is asked once per manufacturer for its nonce, and once for
+        the gas price and chain ID; each manufacturer's transactions then get
+        consecutive nonces in input order.
+        
+        Args:
+            drugs: Keyword arguments of register_drug for each drug
+            
+        Returns:
+            Results in input order, as returned by register_drug
+        """
+        for drug in drugs:
+            self._invalidate_batch(drug['batch_id'])
+        
+        try:
+            manufacturers = list({_checksum(drug['manufacturer_address']) for drug in drugs})
+            
+            async def transaction_count(address: str) -> int:
+                async with self._view_semaphore:
+                    return await self.w3.eth.get_transaction_count(address)
+            
+            nonces, gas_price, chain_id = await asyncio.gather(
+                asyncio.gather(*(transaction_count(address) for address in manufacturers)),
+                self._gas_price(),
+                self.w3.eth.chain_id
+            )
+            next_nonce = dict(zip(manufacturers, nonces))
+        except Exception as e:
+            logger.error(f"Drug registration error: {str(e)}")
+            return [{'success': False, 'error': str(e)} for _ in drugs]
+        
+        results = []
+        for drug in drugs:
+            manufacturer = _checksum(drug['manufacturer_address'])
+            try:
+                # All fields are given, so building makes no further requests
+                transaction = await self._register_drug_fn(
+                    drug['batch_id'],
+                    drug['drug_name'],
+                    drug['composition_hash'],
+                    drug['manufacture_date'],
+                    drug['expiry_date']
+                ).build_transaction({
+                    'from': manufacturer,
+                    'nonce': next_nonce[manufacturer],
+                    'gas': 3000000,
+                    'gasPrice': gas_price,
+                    'chainId': chain_id
+                })
+                next_nonce[manufacturer] += 1
+                
+                results.append({
+                    'success': True,
+                    'transaction': transaction,
+                    'message': 'Transaction built successfully'
+                })
+                
+            except Exception as e:
+                logger.error(f"Drug registration error: {str(e)}")
+                results.append({
+                    'success': False,
+                    'error': str(e)
+                })
+        
+        return results
+    
     async def transfer_ownership(
         self,
         batch_id: str,
@@ -341,19 +613,21 @@ class BlockchainService:
         Returns:
             Transaction receipt dictionary
         """
+        self._invalidate_batch(batch_id)
+        
         try:
             # Build transaction
-            transaction = self.contract.functions.transferOwnership(
+            transaction = await self._transfer_ownership_fn(
                 batch_id,
-                Web3.toChecksumAddress(new_owner),
+                _checksum(new_owner),
                 location
             ).build_transaction({
-                'from': Web3.toChecksumAddress(current_owner),
-                'nonce': self.w3.eth.get_transaction_count(
-                    Web3.toChecksumAddress(current_owner)
+                'from': _checksum(current_owner),
+                'nonce': await self.w3.eth.get_transaction_count(
+                    _checksum(current_owner)
                 ),
                 'gas': 2000000,
-                'gasPrice': self.w3.eth.gas_price
+                'gasPrice': await self._gas_price()
             })
             
             return {
@@ -379,21 +653,17 @@ class BlockchainService:
         Returns:
             Verification result dictionary
         """
+        cached = self._verify_cache.get(batch_id)
+        if cached is not None:
+            return cached
+        
         try:
             # Call contract view function
-            result = self.contract.functions.verifyDrug(batch_id).call()
+            result = await self._call_view(VERIFY_DRUG_CODEC, batch_id)
             
-            return {
-                'success': True,
-                'isGenuine': result[0],
-                'drugName': result[1],
-                'manufacturer': result[2],
-                'compositionHash': result[3],
-                'manufactureDate': result[4],
-                'expiryDate': result[5],
-                'currentOwner': result[6],
-                'transferCount': result[7]
-            }
+            verification = self._format_verification(result)
+            self._verify_cache[batch_id] = verification
+            return verification
             
         except Exception as e:
             logger.error(f"Drug verification error: {str(e)}")
@@ -402,6 +672,313 @@ class BlockchainService:
                 'error': str(e)
             }
     
+    async def verify_drugs_batch(self, batch_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Verify several drugs, sending the calls as JSON-RPC batches
+        
+        Args:
+            batch_ids: Batch identifiers
+            
+        Returns:
+            Verification result dictionaries in input order
+        """
+        verifications = {}
+        missing = []
+        for batch_id in dict.fromkeys(batch_ids):
+            cached = self._verify_cache.get(batch_id)
+            if cached is None:
+                missing.append(batch_id)
+            else:
+                verifications[batch_id] = cached
+        
+        results = await self._call_batch(VERIFY_DRUG_CODEC, [(batch_id,) for batch_id in missing])
+        
+        for batch_id, result in zip(missing, results):
+            if isinstance(result, Exception):
+                logger.error(f"Drug verification error: {str(result)}")
+                verifications[batch_id] = {'success': False, 'error': str(result)}
+            else:
+                verification = self._format_verification(result)
+                self._verify_cache[batch_id] = verification
+                verifications[batch_id] = verification
+        
+        return [verifications[batch_id] for batch_id in batch_ids]
+    
+    async def are_users_registered(self, wallet_addresses: List[str]) -> List[bool]:
+        """
+        Check if several users are registered on the blockchain
+        
+        Args:
+            wallet_addresses: Users' wallet addresses
+            
+        Returns:
+            Registration flags in input order (False if a check failed)
+        """
+        results = await self._call_batch(
+            GET_USER_CODEC,
+            [(_checksum(address),) for address in wallet_addresses]
+        )
+        
+        registered = []
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"User registration check error: {str(result)}")
+                registered.append(False)
+            else:
+                # result[3] is the isRegistered boolean
+                registered.append(result[3])
+        
+        return registered
+    
+    async def _call_batch(
+        self,
+        codec: Tuple[bytes, List[str], List[str]],
+        args_list: List[tuple]
+    ) -> List[Any]:
+        """
+        Call a contract view function for several argument tuples, grouped
+        into JSON-RPC batches of up to RPC_BATCH_SIZE calls
+        
+        Batches are sent concurrently, and a batch the node rejects as a whole
+        falls back to individual calls; at most VERIFY_CONCURRENCY requests
+        are in flight at once.
+        
+        Args:
+            codec: Selector and types from _view_codec
+            args_list: Function arguments for each call
+            
+        Returns:
+            Decoded results in input order, with the exception for failed calls
+        """
+        async def call_one(args: tuple) -> Any:
+            async with self._view_semaphore:
+                try:
+                    return await self._call_view(codec, *args)
+                except Exception as e:
+                    return e
+        
+        async def call_chunk(chunk: List[tuple]) -> List[Any]:
+            try:
+                async with self._view_semaphore:
+                    return await self._post_batch(codec, chunk)
+            except Exception as e:
+                logger.warning(f"Batched contract call failed, retrying individually: {str(e)}")
+                return await asyncio.gather(*(call_one(args) for args in chunk))
+        
+        chunks = await asyncio.gather(*(
+            call_chunk(args_list[start:start + RPC_BATCH_SIZE])
+            for start in range(0, len(args_list), RPC_BATCH_SIZE)
+        ))
+        return [result for chunk in chunks for result in chunk]
+    
+    async def _post_batch(
+        self,
+        codec: Tuple[bytes, List[str], List[str]],
+        args_list: List[tuple]
+    ) -> List[Any]:
+        """
+        Send eth_call requests as one JSON-RPC batch (a JSON array POST)
+        
+        Args:
+            codec: Selector and types from _view_codec
+            args_list: Function arguments for each call
+            
+        Returns:
+            Decoded results in input order, with an exception for failed calls
+            
+        Raises:
+            ValueError: If the node does not answer with a batch response
+        """
+        selector, input_types, output_types = codec
+        payload = json.dumps([
+            {
+                'jsonrpc': '2.0',
+                'id': request_id,
+                'method': 'eth_call',
+                'params': [
+                    {
+                        'to': self.contract_address,
+                        'data': '0x' + (selector + encode(input_types, args)).hex()
+                    },
+                    'latest'
+                ]
+            }
+            for request_id, args in enumerate(args_list)
+        ])
+        
+        session = await self._get_session()
+        provider = self.w3.provider
+        
+        async def send():
+            async with session.post(
+                provider.endpoint_uri,
+                data=payload,
+                **provider.get_request_kwargs()
+            ) as response:
+                return await response.json(content_type=None)
+        
+        responses = await _send_throttled(self._limiter, send, 'eth_call batch')
+        if not isinstance(responses, list):
+            raise ValueError(f"Node rejected JSON-RPC batch: {responses}")
+        
+        by_id = {response.get('id'): response for response in responses}
+        results = []
+        for request_id in range(len(args_list)):
+            response = by_id.get(request_id)
+            try:
+                if response is None:
+                    raise ValueError("No response for call in JSON-RPC batch")
+                if 'error' in response:
+                    raise ValueError(response['error'])
+                results.append(decode(output_types, bytes.fromhex(response['result'][2:])))
+            except Exception as e:
+                results.append(e)
+        
+        return results
+    
+    async def _call_view(self, codec: Tuple[bytes, List[str], List[str]], *args) -> tuple:
+        """
+        Call a contract view function with a pre-encoded selector
+        
+        Args:
+            codec: Selector and types from _view_codec
+            *args: Function arguments
+            
+        Returns:
+            Decoded return values
+        """
+        selector, input_types, output_types = codec
+        raw = await self.w3.eth.call({
+            'to': self.contract_address,
+            'data': selector + encode(input_types, args)
+        })
+        return decode(output_types, raw)
+    
+    async def _await_receipt(self, tx_hash, timeout: float = RECEIPT_TIMEOUT):
+        """
+        Wait for a transaction receipt, polling with exponential backoff
+        
+        Args:
+            tx_hash: Transaction hash
+            timeout: Seconds to wait before giving up
+            
+        Returns:
+            Transaction receipt
+            
+        Raises:
+            TimeExhausted: If the transaction is not mined within the timeout
+        """
+        deadline = time.monotonic() + timeout
+        delay = RECEIPT_POLL_INITIAL
+        
+        while True:
+            try:
+                return await self.w3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                pass
+            
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeExhausted(
+                    f"Transaction {tx_hash.hex()} is not in the chain after {timeout} seconds"
+                )
+            
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, RECEIPT_POLL_MAX)
+    
+    async def _gas_price(self) -> int:
+        """
+        Get the node's gas price, reusing it for GAS_PRICE_TTL seconds
+        
+        Returns:
+            Gas price in wei
+        """
+        now = time.monotonic()
+        if self._gas_price_cache is not None:
+            price, fetched_at = self._gas_price_cache
+            if now - fetched_at < GAS_PRICE_TTL:
+                return price
+        
+        price = await self.w3.eth.gas_price
+        self._gas_price_cache = (price, now)
+        return price
+    
+    async def _next_owner_nonce(self, owner_address: str) -> int:
+        """
+        Get the nonce for the next transaction sent by the contract owner
+        
+        The nonce is read from the node once and then tracked locally, since
+        the owner's transactions are only signed and sent by this service.
+        
+        Args:
+            owner_address: Contract owner's checksummed address
+            
+        Returns:
+            Nonce to use for the transaction
+        """
+        if self._owner_nonce is None:
+            self._owner_nonce = await self.w3.eth.get_transaction_count(owner_address, 'pending')
+        return self._owner_nonce
+    
+    async def get_block_number(self) -> int:
+        """
+        Get the number of the latest block
+        
+        Returns:
+            Latest block number
+        """
+        return await self.w3.eth.block_number
+    
+    async def get_transferred_batch_topics(self, from_block: int, to_block: int) -> List[str]:
+        """
+        Get the batches transferred in a block range from OwnershipTransferred logs
+        
+        The batch ID is an indexed string, so logs only carry its keccak hash.
+        
+        Args:
+            from_block: First block to scan
+            to_block: Last block to scan (inclusive)
+            
+        Returns:
+            Distinct hex keccak hashes of the transferred batch IDs
+        """
+        logs = await self.w3.eth.get_logs({
+            'address': self.contract_address,
+            'topics': [OWNERSHIP_TRANSFERRED_TOPIC],
+            'fromBlock': from_block,
+            'toBlock': to_block
+        })
+        return list({bytes(log['topics'][1]).hex() for log in logs})
+    
+    def invalidate_batches(self, batch_ids: List[str]) -> None:
+        """
+        Drop cached view results for batches known to have changed on chain
+        
+        Args:
+            batch_ids: Batch identifiers
+        """
+        for batch_id in batch_ids:
+            self._invalidate_batch(batch_id)
+    
+    def _invalidate_batch(self, batch_id: str) -> None:
+        """Drop cached view results for a batch that is about to change"""
+        self._verify_cache.pop(batch_id, None)
+        self._history_cache.pop(batch_id, None)
+    
+    def _format_verification(self, result) -> Dict[str, Any]:
+        """Convert verifyDrug contract output to a result dictionary"""
+        return {
+            'success': True,
+            'isGenuine': result[0],
+            'drugName': result[1],
+            'manufacturer': _checksum(result[2]),
+            'compositionHash': result[3],
+            'manufactureDate': result[4],
+            'expiryDate': result[5],
+            'currentOwner': _checksum(result[6]),
+            'transferCount': result[7]
+        }
+    
     async def get_drug_history(self, batch_id: str) -> Dict[str, Any]:
         """
         Get complete ownership history from blockchain
@@ -412,26 +989,35 @@ class BlockchainService:
         Returns:
             Ownership history list
         """
+        cached = self._history_cache.get(batch_id)
+        if cached is not None:
+            return cached
+        
         try:
             # Call contract view function
-            history = self.contract.functions.getDrugHistory(batch_id).call()
-            
-            # Convert to readable format
-            formatted_history = []
-            for record in history:
-                formatted_history.append({
-                    'from': record[0],
-                    'to': record[1],
+            (history,) = await self._call_view(GET_DRUG_HISTORY_CODEC, batch_id)
+            
+            # Convert to readable format (role enums are uint8, never negative)
+            roles = ENUM_TO_ROLE
+            role_count = len(roles)
+            formatted_history = [
+                {
+                    'from': _checksum(record[0]),
+                    'to': _checksum(record[1]),
                     'timestamp': record[2],
                     'location': record[3],
-                    'fromRole': self._role_enum_to_string(record[4]),
-                    'toRole': self._role_enum_to_string(record[5])
-                })
+                    'fromRole': roles[record[4]] if record[4] < role_count else "UNKNOWN",
+                    'toRole': roles[record[5]] if record[5] < role_count else "UNKNOWN"
+                }
+                for record in history
+            ]
             
-            return {
+            history_result = {
                 'success': True,
                 'history': formatted_history
             }
+            self._history_cache[batch_id] = history_result
+            return history_result
             
         except Exception as e:
             logger.error(f"History retrieval error: {str(e)}")
@@ -440,18 +1026,47 @@ class BlockchainService:
                 'error': str(e)
             }
     
-    def _role_enum_to_string(self, role_num: int) -> str:
-        """Convert role enum number to string"""
-        roles = {
-            0: "NONE",
-            1: "MANUFACTURER",
-            2: "DISTRIBUTOR",
-            3: "PHARMACY",
-            4: "CONSUMER",
-            5: "REGULATOR"
-        }
-        return roles.get(role_num, "UNKNOWN")
+    async def ping(self) -> bool:
+        """
+        Check that the blockchain node is reachable
+        
+        Returns:
+            True if the node answered, False otherwise
+        """
+        try:
+            await self.w3.eth.block_number
+            return True
+            
+        except Exception as e:
+            logger.error(f"Blockchain ping error: {str(e)}")
+            return False
 
 
-# Global blockchain service instance
-blockchain_service = BlockchainService()
+# Shared blockchain service instance, created on first use
+_blockchain_service: Optional[BlockchainService] = None
+
+
+def get_blockchain_service() -> BlockchainService:
+    """
+    Get the shared blockchain service, creating it on first use
+    
+    Returns:
+        BlockchainService instance
+    """
+    global _blockchain_service
+    if _blockchain_service is None:
+        _blockchain_service = BlockchainService()
+    return _blockchain_service
+
+
+async def get_blockchain() -> BlockchainService:
+    """
+    FastAPI dependency for the shared blockchain service
+    
+    Async so FastAPI calls it on the event loop instead of a worker thread;
+    override it in tests to substitute the service.
+    
+    Returns:
+        BlockchainService instance
+    """
+    return get_blockchain_service()
@@ -2,12 +2,27 @@
 Hashing Utilities for Drug Composition
 Uses SHA-256 for secure, deterministic hashing
 """
+from functools import lru_cache
 import hashlib
+import hmac
 import json
-from typing import Dict, Any
+import logging
+import orjson
+import re
+import ssl
+from typing import Dict, Any, List, Union
 
+logger = logging.getLogger(__name__)
 
-def normalize_composition(composition: Dict[str, Any]) -> str:
+# Floats outside this range are written with an exponent, which orjson and
+# the json module format differently ("1e-07" vs "1e-7")
+_PLAIN_FLOAT_RANGE = (1e-4, 1e16)
+
+# Control characters in orjson output: raw DEL, or escaped C0 characters
+_CONTROL_CHARACTER = re.compile(rb'\x7f|\\u00[01]|\\[bfnrt]')
+
+
+def normalize_composition(composition: Dict[str, Any]) -> bytes:
     """
     Normalize composition data to ensure consistent hashing
     
@@ -15,18 +30,40 @@ def normalize_composition(composition: Dict[str, Any]) -> str:
         composition: Drug composition dictionary
         
     Returns:
-        Normalized JSON string ready for hashing
+        Normalized UTF-8 JSON bytes ready for hashing
     """
-    # Sort ingredients by name for consistency
+    # Sort ingredients by name for consistency (without mutating the input)
     if 'ingredients' in composition:
+        composition = dict(composition)
         composition['ingredients'] = sorted(
             composition['ingredients'],
             key=lambda x: x.get('name', '').lower()
         )
     
-    # Convert to JSON with sorted keys
-    normalized = json.dumps(composition, sort_keys=True, separators=(',', ':'))
-    return normalized
+    # Convert to JSON with sorted keys. orjson produces the same compact output
+    # as json.dumps except for non-ASCII text, control characters (DEL is left
+    # unescaped) and exponent floats; those rare compositions keep using
+    # json.dumps so existing hashes stay valid.
+    if _orjson_compatible(composition):
+        normalized = orjson.dumps(composition, option=orjson.OPT_SORT_KEYS)
+        if normalized.isascii() and not _CONTROL_CHARACTER.search(normalized):
+            return normalized
+    
+    return json.dumps(composition, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def _orjson_compatible(value: Any) -> bool:
+    """
+    Check that all floats in a value are formatted identically by orjson and json
+    """
+    if isinstance(value, float):
+        low, high = _PLAIN_FLOAT_RANGE
+        return value == 0 or low <= abs(value) < high
+    if isinstance(value, dict):
+        return all(_orjson_compatible(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return all(_orjson_compatible(item) for item in value)
+    return True
 
 
 def generate_composition_hash(composition: Dict[str, Any]) -> str:
@@ -53,11 +90,32 @@ def generate_composition_hash(composition: Dict[str, Any]) -> str:
     # Normalize composition for consistent hashing
     normalized_composition = normalize_composition(composition)
     
-    # Generate SHA-256 hash
-    hash_object = hashlib.sha256(normalized_composition.encode('utf-8'))
-    hash_hex = hash_object.hexdigest()
+    # Generate SHA-256 hash (repeated compositions are served from cache)
+    return _hash_canonical(normalized_composition)
+
+
+@lru_cache(maxsize=4096)
+def _hash_canonical(canonical: bytes) -> str:
+    """
+    SHA-256 hex digest of canonical composition bytes, memoized
+    """
+    return hashlib.sha256(canonical).hexdigest()
+
+
+def generate_composition_hashes(compositions: List[Dict[str, Any]]) -> List[str]:
+    """
+    Generate SHA-256 hashes for several drug compositions
     
-    return hash_hex
+    Args:
+        compositions: Drug composition dictionaries
+        
+    Returns:
+        64-character hexadecimal SHA-256 hashes, in input order
+    """
+    return [
+        _hash_canonical(normalize_composition(composition))
+        for composition in compositions
+    ]
 
 
 def verify_composition_hash(composition: Dict[str, Any], expected_hash: str) -> bool:
@@ -71,19 +129,70 @@ def verify_composition_hash(composition: Dict[str, Any], expected_hash: str) ->
     Returns:
         True if hash matches, False otherwise
     """
-    actual_hash = generate_composition_hash(composition)
-    return actual_hash.lower() == expected_hash.lower()
+    try:
+        expected_digest = bytes.fromhex(expected_hash)
+    except ValueError:
+        return False
+    
+    # Compare raw digests in constant time; fromhex already ignores case
+    actual_digest = hashlib.sha256(normalize_composition(composition)).digest()
+    return hmac.compare_digest(actual_digest, expected_digest)
+
+
+def hashes_match(first: str, second: str) -> bool:
+    """
+    Compare two hexadecimal hashes, ignoring case
+    
+    Args:
+        first: Hexadecimal hash
+        second: Hexadecimal hash
+        
+    Returns:
+        True if both hashes are the same text apart from case, False otherwise
+    """
+    if len(first) != len(second):
+        return False
+    
+    # Exact comparison of the lowercased text, in constant time
+    return hmac.compare_digest(first.lower().encode('utf-8'), second.lower().encode('utf-8'))
 
 
-def hash_string(data: str) -> str:
+def hash_string(data: Union[str, bytes]) -> str:
     """
     Generate SHA-256 hash of a string
     
     Args:
-        data: String to hash
+        data: String to hash, or bytes to hash as-is
         
     Returns:
         64-character hexadecimal SHA-256 hash
     """
-    hash_object = hashlib.sha256(data.encode('utf-8'))
-    return hash_object.hexdigest()
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+def check_sha256_backend() -> None:
+    """
+    Log which SHA-256 implementation is in use
+
+    hashlib uses OpenSSL when available, which picks the CPU's SHA
+    extensions (sha_ni) at runtime. Warns when either is missing.
+    """
+    backend = type(hashlib.sha256()).__module__
+    if backend != "_hashlib":
+        logger.warning("SHA-256 is not backed by OpenSSL (using %s)", backend)
+        return
+
+    try:
+        with open("/proc/cpuinfo") as cpuinfo:
+            has_sha_ni = " sha_ni" in cpuinfo.read()
+    except OSError:
+        # Not Linux; OpenSSL still selects the best implementation itself
+        logger.info("SHA-256 backed by %s", ssl.OPENSSL_VERSION)
+        return
+
+    if has_sha_ni:
+        logger.info("SHA-256 backed by %s with SHA extensions", ssl.OPENSSL_VERSION)
+    else:
+        logger.warning("CPU lacks SHA extensions; SHA-256 uses the software path")
@@ -0,0 +1,190 @@
+"""
+Ownership State Utilities
+Keeps the denormalized ownership fields of stored drugs in sync with the chain
+"""
+from eth_utils import keccak
+from pymongo import UpdateOne
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+from app.config import settings
+from app.database import get_database
+
+logger = logging.getLogger(__name__)
+
+# Seconds between polls for new OwnershipTransferred events
+OWNERSHIP_POLL_INTERVAL = 5
+
+# Maximum number of blocks scanned by one eth_getLogs request
+LOG_BLOCK_RANGE = 2000
+
+# sync_state document recording the last block whose events were applied
+OWNERSHIP_SYNC_STATE_ID = "ownershipTransferred"
+
+
+def batch_id_topic(batch_id: str) -> str:
+    """
+    Hash a batch ID the way the contract indexes it in event logs
+
+    Args:
+        batch_id: Batch identifier
+
+    Returns:
+        Hex keccak-256 hash, stored on drugs as batchIdTopic
+    """
+    return keccak(text=batch_id).hex()
+
+
+def chain_state_update(
+    batch_id: str,
+    stored: Optional[Dict[str, Any]],
+    verification: Dict[str, Any]
+) -> Optional[UpdateOne]:
+    """
+    Build an update syncing a stored drug's ownership state with the chain
+
+    Transfers are signed client-side, so currentOwner and transferCount are
+    only written once the chain reports them.
+
+    Args:
+        batch_id: Batch identifier
+        stored: Stored composition document with currentOwner and transferCount
+        verification: Result of BlockchainService.verify_drug
+
+    Returns:
+        Update for drug_composition_storage, or None if already in sync
+    """
+    if not stored or not verification.get("success"):
+        return None
+
+    current_owner = verification["currentOwner"].lower()
+    transfer_count = verification["transferCount"]
+
+    if stored.get("currentOwner") == current_owner and stored.get("transferCount") == transfer_count:
+        return None
+
+    return UpdateOne(
+        {"batchId": batch_id},
+        {"$set": {"currentOwner": current_owner, "transferCount": transfer_count}}
+    )
+
+
+async def sync_chain_state(db, updates: List[Optional[UpdateOne]]) -> None:
+    """
+    Apply ownership updates in one unordered bulk write
+
+    Failures are logged rather than raised, so a read request never fails
+    because the denormalized copy could not be refreshed.
+
+    Args:
+        db: Database instance
+        updates: Updates from chain_state_update; None entries are skipped
+    """
+    updates = [update for update in updates if update is not None]
+    if not updates:
+        return
+
+    try:
+        await db.drug_composition_storage.bulk_write(updates, ordered=False)
+    except Exception as e:
+        logger.error(f"Ownership state sync error: {str(e)}")
+
+
+async def backfill_batch_id_topics(db) -> None:
+    """
+    Store batchIdTopic on drugs registered before it was recorded
+
+    Args:
+        db: Database instance
+    """
+    cursor = db.drug_composition_storage.find(
+        {"batchIdTopic": {"$exists": False}},
+        {"batchId": 1}
+    )
+    updates = [
+        UpdateOne({"_id": doc["_id"]}, {"$set": {"batchIdTopic": batch_id_topic(doc["batchId"])}})
+        async for doc in cursor
+    ]
+    if updates:
+        await db.drug_composition_storage.bulk_write(updates, ordered=False)
+        logger.info(f"Stored batch ID topics for {len(updates)} drugs")
+
+
+async def sync_ownership_events(db, blockchain) -> None:
+    """
+    Apply OwnershipTransferred events emitted since the last processed block
+
+    Transferred batches are re-verified on chain, so the stored state is the
+    chain's current state rather than a count of events seen.
+
+    Args:
+        db: Database instance
+        blockchain: Blockchain service to read logs and drug state from
+    """
+    state = await db.sync_state.find_one({"_id": OWNERSHIP_SYNC_STATE_ID})
+    next_block = state["block"] + 1 if state else settings.CONTRACT_DEPLOY_BLOCK
+    latest_block = await blockchain.get_block_number()
+
+    while next_block <= latest_block:
+        to_block = min(next_block + LOG_BLOCK_RANGE - 1, latest_block)
+        topics = await blockchain.get_transferred_batch_topics(next_block, to_block)
+
+        if topics:
+            stored = await db.drug_composition_storage.find(
+                {"batchIdTopic": {"$in": topics}},
+                {"_id": 0, "batchId": 1, "currentOwner": 1, "transferCount": 1}
+            ).to_list(length=len(topics))
+            batch_ids = [doc["batchId"] for doc in stored]
+
+            blockchain.invalidate_batches(batch_ids)
+            verifications = await blockchain.verify_drugs_batch(batch_ids)
+
+            # Retry the range on the next poll rather than skip a transfer
+            failed = [
+                doc["batchId"]
+                for doc, verification in zip(stored, verifications)
+                if not verification.get("success")
+            ]
+            if failed:
+                raise RuntimeError(f"Could not verify transferred batches: {failed}")
+
+            updates = [
+                update
+                for update in (
+                    chain_state_update(doc["batchId"], doc, verification)
+                    for doc, verification in zip(stored, verifications)
+                )
+                if update is not None
+            ]
+            if updates:
+                await db.drug_composition_storage.bulk_write(updates, ordered=False)
+
+        await db.sync_state.update_one(
+            {"_id": OWNERSHIP_SYNC_STATE_ID},
+            {"$set": {"block": to_block}},
+            upsert=True
+        )
+        next_block = to_block + 1
+
+
+async def watch_ownership_events(blockchain) -> None:
+    """
+    Keep stored ownership state in sync with the chain until cancelled
+
+    Run as a background task for the lifetime of the application.
+
+    Args:
+        blockchain: Blockchain service to read logs and drug state from
+    """
+    db = await get_database()
+    backfilled = False
+
+    while True:
+        try:
+            if not backfilled:
+                await backfill_batch_id_topics(db)
+                backfilled = True
+            await sync_ownership_events(db, blockchain)
+        except Exception as e:
+            logger.error(f"Ownership event sync error: {str(e)}")
+        await asyncio.sleep(OWNERSHIP_POLL_INTERVAL)
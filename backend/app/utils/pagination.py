@@ -0,0 +1,51 @@
+"""
+Pagination Utilities
+Cursor-based pagination over MongoDB ObjectIds
+"""
+from bson import ObjectId
+from bson.errors import InvalidId
+from typing import Any, Dict, List, Optional
+
+# Upper bound for any page size requested by a client
+MAX_PAGE_SIZE = 1000
+
+# Response header carrying the cursor for endpoints that return bare lists
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def cursor_filter(after: Optional[str]) -> Dict[str, Any]:
+    """
+    Build a MongoDB filter selecting documents after a pagination cursor
+
+    Args:
+        after: Cursor returned with the previous page (stringified ObjectId)
+
+    Returns:
+        Filter on _id, or an empty filter for the first page
+
+    Raises:
+        ValueError: If the cursor is not a valid ObjectId
+    """
+    if not after:
+        return {}
+
+    try:
+        return {"_id": {"$gt": ObjectId(after)}}
+    except (InvalidId, TypeError):
+        raise ValueError(f"Invalid pagination cursor: {after}")
+
+
+def next_cursor(docs: List[Dict[str, Any]], limit: int) -> Optional[str]:
+    """
+    Get the cursor for the page following the given documents
+
+    Args:
+        docs: Documents of the current page, sorted by _id
+        limit: Page size used for the query
+
+    Returns:
+        Cursor for the next page, or None if this is the last page
+    """
+    if len(docs) < limit:
+        return None
+    return str(docs[-1]["_id"])
@@ -2,11 +2,82 @@
 Drug Composition Validation Utilities
 Validates drug composition against standard dataset
 """
-from typing import Dict, List, Any, Tuple
+from cachetools import TTLCache
+from typing import Dict, List, Any, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Standard compositions by drug name; the dataset is reference data that
+# rarely changes, so entries are reused for a few minutes
+_dataset_cache = TTLCache(maxsize=2048, ttl=300)
+
+# (standard composition, lowercase ingredient names) by drug name, so the
+# expected names are built once per cached composition rather than per check
+_dataset_names_cache = TTLCache(maxsize=2048, ttl=300)
+
+
+async def get_standard_composition(db, drug_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Get the standard composition of a drug from the dataset
+    
+    Args:
+        db: Database instance
+        drug_name: Name of the drug
+        
+    Returns:
+        Standard composition, or None if the drug is not in the dataset
+    """
+    composition = _dataset_cache.get(drug_name)
+    if composition is not None:
+        return composition
+    
+    dataset_entry = await db.drug_composition_dataset.find_one(
+        {"drugName": drug_name},
+        {"standardComposition": 1}
+    )
+    if not dataset_entry:
+        return None
+    
+    composition = dataset_entry.get("standardComposition", {})
+    _dataset_cache[drug_name] = composition
+    return composition
+
+
+async def get_standard_compositions(db, drug_names: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Get the standard compositions of several drugs from the dataset
+    
+    Args:
+        db: Database instance
+        drug_names: Names of the drugs
+        
+    Returns:
+        Standard compositions by drug name, for the drugs in the dataset
+    """
+    compositions = {}
+    missing = []
+    
+    for drug_name in set(drug_names):
+        composition = _dataset_cache.get(drug_name)
+        if composition is None:
+            missing.append(drug_name)
+        else:
+            compositions[drug_name] = composition
+    
+    if missing:
+        dataset_cursor = db.drug_composition_dataset.find(
+            {"drugName": {"$in": missing}},
+            {"drugName": 1, "standardComposition": 1},
+            batch_size=len(missing)
+        )
+        for dataset_entry in await dataset_cursor.to_list(length=len(missing)):
+            composition = dataset_entry.get("standardComposition", {})
+            _dataset_cache[dataset_entry["drugName"]] = composition
+            compositions[dataset_entry["drugName"]] = composition
+    
+    return compositions
+
 
 async def validate_composition(
     drug_name: str,
@@ -25,20 +96,14 @@ async def validate_composition(
         Tuple of (is_valid, message, validation_details)
     """
     try:
-        provided_ingredients = {
-            ing['name'].lower(): ing 
-            for ing in provided_composition.get('ingredients', [])
-        }
-        
-        dataset_ingredients = {
-            ing['name'].lower(): ing 
-            for ing in dataset_composition.get('ingredients', [])
+        # Only ingredient names are compared, so build the name sets directly
+        provided_names = {
+            ing['name'].lower()
+            for ing in provided_composition.get('ingredients') or ()
         }
+        dataset_names = _expected_names(drug_name, dataset_composition)
         
         # Find missing and extra ingredients
-        provided_names = set(provided_ingredients.keys())
-        dataset_names = set(dataset_ingredients.keys())
-        
         missing_ingredients = list(dataset_names - provided_names)
         extra_ingredients = list(provided_names - dataset_names)
         
@@ -72,6 +137,29 @@ async def validate_composition(
         return False, f"Validation error: {str(e)}", {}
 
 
+def _expected_names(drug_name: str, dataset_composition: Dict[str, Any]) -> frozenset:
+    """
+    Get the lowercase ingredient names of a standard composition, memoized
+    
+    Args:
+        drug_name: Name of the drug
+        dataset_composition: Standard composition from dataset
+        
+    Returns:
+        Lowercase ingredient names
+    """
+    cached = _dataset_names_cache.get(drug_name)
+    if cached is not None and cached[0] is dataset_composition:
+        return cached[1]
+    
+    names = frozenset(
+        ing['name'].lower()
+        for ing in dataset_composition.get('ingredients') or ()
+    )
+    _dataset_names_cache[drug_name] = (dataset_composition, names)
+    return names
+
+
 def normalize_ingredient_name(name: str) -> str:
     """
     Normalize ingredient name for comparison